@@ -1,73 +1,108 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
-from pptx import Presentation
-from pptx.util import Inches, Pt
 from io import BytesIO
+from org_layout import build_hierarchy, visible_subtree, compute_layout, layout_edges, node_path_label
+from utils import dataset_version, filter_signature
+from jobs import submit_export
+from components import show_background_export
 
 #-------------------------------------
 # دالة إنشاء الهيكل التنظيمي
 #-------------------------------------
-def create_org_chart(df, color_scheme="default", style="hierarchical", show_details=True):
+# ربط خيارات الواجهة بأنماط محرك التخطيط
+ORG_CHART_STYLES = {
+    "هرمي": "hierarchical",
+    "شجري": "icicle",
+    "دائري": "radial",
+    "مستطيلات": "treemap",
+}
+
+ORG_CHART_COLORS = {
+    "default": ['#1f77b4', '#2ca02c', '#ff7f0e', '#9467bd', '#8c564b'],
+    "gradient": ['#08306b', '#2171b5', '#6baed6', '#9ecae1', '#c6dbef'],
+    "high_contrast": ['#000000', '#e41a1c', '#377eb8', '#4daf4a', '#ff7f00'],
+}
+
+ORG_CHART_COLOR_SCHEMES = {
+    "الافتراضي": "default",
+    "متدرج": "gradient",
+    "عالي التباين": "high_contrast",
+}
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_org_hierarchy(version, _df):
+    """بناء شجرة الهيكل التنظيمي مرة واحدة لكل نسخة من البيانات"""
+    return build_hierarchy(_df)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def get_org_layout(version, style, expanded, max_depth, _tree):
+    """حساب مواضع العقد الظاهرة فقط لكل نسخة ونمط وحالة توسيع"""
+    visible = visible_subtree(_tree, expanded, max_depth)
+    return visible, compute_layout(visible, style)
+
+
+def create_org_chart(df, color_scheme="default", style="hierarchical", show_details=True,
+                     expanded=(), max_depth=1, version=None):
     """إنشاء الهيكل التنظيمي التفاعلي مع خيارات تخصيص"""
     if 'الادارة' not in df.columns:
         return None
 
-    departments = df['الادارة'].unique()
-    fig = go.Figure()
-
-    # إنشاء مستويات الهيكل التنظيمي
-    y_positions = {}
-    current_y = 0
-
-    # معلومات إضافية لكل إدارة
-    dept_info = {}
-    for dept in departments:
-        dept_data = df[df['الادارة'] == dept]
-        dept_info[dept] = {
-            'عدد الموظفين': len(dept_data),
-            'الفئات الوظيفية': dept_data['فئة الوظيفة'].value_counts().to_dict() if 'فئة الوظيفة' in df.columns else {},
-            'متوسط العمر': round((datetime.now() - pd.to_datetime(dept_data['تاريخ الميلاد'])).mean().days / 365.25, 1) if 'تاريخ الميلاد' in df.columns else None
-        }
-
-    # المستوى الأول - الإدارة العليا
-    fig.add_trace(go.Scatter(
-        x=[0], y=[current_y],
-        mode='markers+text',
-        text=['الإدارة العليا'],
-        textposition='middle center',
-        marker=dict(size=30, color='#1f77b4'),
-        hoverinfo='text'
-    ))
-
-    # المستوى الثاني - الإدارات
-    current_y -= 1
-    x_position = -len(departments) / 2
-    for dept in departments:
-        y_positions[dept] = current_y
-        fig.add_trace(go.Scatter(
-            x=[x_position], y=[current_y],
-            mode='markers+text',
-            text=[dept],
-            textposition='middle center',
-            marker=dict(size=25, color='#2ca02c'),
-            hoverinfo='text'
+    version = version or dataset_version(df)
+    tree = get_org_hierarchy(version, df)
+    colors = ORG_CHART_COLORS.get(color_scheme, ORG_CHART_COLORS["default"])
+
+    if style in ("treemap", "icicle"):
+        # المتصفح يتولى توسيع الفروع عند النقر، ولا يُعرض إلا عمق محدود في البداية
+        trace_type = go.Treemap if style == "treemap" else go.Icicle
+        fig = go.Figure(trace_type(
+            ids=tree['ids'],
+            labels=tree['labels'],
+            parents=tree['parents'],
+            values=tree['counts'],
+            branchvalues='total',
+            maxdepth=max_depth + 1,
+            marker=dict(colors=[colors[d % len(colors)] for d in tree['depths']]),
+            hovertemplate='%{label}<br>عدد الموظفين: %{value}<extra></extra>' if show_details else '%{label}<extra></extra>',
         ))
+    else:
+        visible, positions = get_org_layout(version, style, tuple(sorted(expanded)), max_depth, tree)
+        edge_x, edge_y = layout_edges(visible, positions)
 
-        # خطوط الربط مع الإدارة العليا
+        fig = go.Figure()
+        # خطوط الربط بين المستويات في أثر واحد
         fig.add_trace(go.Scatter(
-            x=[0, x_position],
-            y=[0, current_y],
+            x=edge_x, y=edge_y,
             mode='lines',
             line=dict(color='#777', width=1),
             hoverinfo='none',
             showlegend=False
         ))
 
-        x_position += 1
+        node_x = [positions[node_id][0] for node_id in visible['ids']]
+        node_y = [positions[node_id][1] for node_id in visible['ids']]
+        hover = [
+            f"{label}<br>عدد الموظفين: {count}" if show_details else label
+            for label, count in zip(visible['labels'], visible['counts'])
+        ]
+        fig.add_trace(go.Scatter(
+            x=node_x, y=node_y,
+            mode='markers+text',
+            text=visible['labels'],
+            textposition='bottom center' if style != 'radial' else 'middle center',
+            hovertext=hover,
+            hoverinfo='text',
+            marker=dict(
+                size=[max(30 - 5 * d, 10) for d in visible['depths']],
+                color=[colors[d % len(colors)] for d in visible['depths']],
+            ),
+        ))
+
+        if style == 'radial':
+            fig.update_yaxes(scaleanchor='x', scaleratio=1)
 
     # إعدادات المخطط
     fig.update_layout(
@@ -90,8 +125,15 @@ def create_org_chart(df, color_scheme="default", style="hierarchical", show_deta
 #-------------------------------------
 # دالة إنشاء ملف باوربوينت
 #-------------------------------------
-def create_org_chart_pptx(df):
-    """إنشاء ملف باوربوينت للهيكل التنظيمي"""
+def create_org_chart_pptx(df, progress=None):
+    """إنشاء ملف باوربوينت للهيكل التنظيمي
+
+    تُحسب بيانات جميع الشرائح في تجميع واحد بدلاً من تصفية البيانات لكل إدارة،
+    ويمكن تمرير progress(fraction, message) لمتابعة التقدم عند التشغيل في الخلفية.
+    """
+    from pptx import Presentation
+    from pptx.util import Inches, Pt
+
     prs = Presentation()
 
     # شريحة العنوان
@@ -99,12 +141,18 @@ def create_org_chart_pptx(df):
     title = title_slide.shapes.title
     title.text = "الهيكل التنظيمي"
 
+    # تجميع واحد لكل بيانات الشرائح
+    dept_counts = df['الادارة'].value_counts()
+    job_cat_counts = {}
+    if 'فئة الوظيفة' in df.columns:
+        grouped = df.groupby('الادارة', sort=False)['فئة الوظيفة'].value_counts()
+        job_cat_counts = {dept: counts.droplevel(0) for dept, counts in grouped.groupby(level=0, sort=False)}
+
     # شريحة الإحصائيات العامة
     stats_slide = prs.slides.add_slide(prs.slide_layouts[1])
     stats_slide.shapes.title.text = "إحصائيات الموظفين"
     stats_content = stats_slide.placeholders[1]
 
-    dept_counts = df['الادارة'].value_counts()
     stats_text = f"""
     • إجمالي عدد الموظفين: {len(df)}
     • عدد الإدارات: {len(dept_counts)}
@@ -113,27 +161,45 @@ def create_org_chart_pptx(df):
     stats_content.text = stats_text
 
     # شريحة لكل إدارة
-    for dept in df['الادارة'].unique():
+    departments = df['الادارة'].dropna().unique()
+    total = max(len(departments), 1)
+    for i, dept in enumerate(departments):
         dept_slide = prs.slides.add_slide(prs.slide_layouts[1])
         dept_slide.shapes.title.text = f"إدارة {dept}"
-        dept_data = df[df['الادارة'] == dept]
 
         content = dept_slide.placeholders[1]
         text = f"""
-        • عدد الموظفين: {len(dept_data)}
+        • عدد الموظفين: {dept_counts[dept]}
         • الفئات الوظيفية:
         """
-        if 'فئة الوظيفة' in dept_data.columns:
-            for job_cat, count in dept_data['فئة الوظيفة'].value_counts().items():
+        if dept in job_cat_counts:
+            for job_cat, count in job_cat_counts[dept].items():
                 text += f"\n  - {job_cat}: {count} موظف"
 
         content.text = text
 
+        if progress is not None:
+            progress((i + 1) / total, f"إدارة {i + 1} من {total}")
+
     # حفظ الملف في الذاكرة
     pptx_buffer = BytesIO()
     prs.save(pptx_buffer)
-    pptx_buffer.seek(0)
-    return pptx_buffer
+    return pptx_buffer.getvalue()
+
+
+def show_pptx_export(df, version):
+    """عرض زر تصدير الباوربوينت وحالة مهمة التصدير الخلفية"""
+    job_key = ('org_chart_pptx', version)
+    show_background_export(
+        job_key,
+        "تصدير كملف PowerPoint",
+        lambda: submit_export(
+            job_key, create_org_chart_pptx, df,
+            file_name="organizational_structure.pptx", report_progress=True
+        ),
+        mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        key="export_pptx_export_section_1",
+    )
 
 #-------------------------------------
 # عرض التحليلات المتقدمة
@@ -155,7 +221,7 @@ def display_advanced_analytics():
     # استخدام generate_unique_key لكل مفتاح
     chart_style = st.sidebar.selectbox(
         "نمط عرض الهيكل التنظيمي",
-        options=["هرمي", "شجري", "دائري"],
+        options=list(ORG_CHART_STYLES.keys()),
         key="org_chart_style_display"
     )
 
@@ -183,22 +249,39 @@ def display_advanced_analytics():
 
     st.markdown("## 🏢 الهيكل التنظيمي")
 
+    # نسخة البيانات المحفوظة في الجلسة مع الإدارات المختارة، بدلاً من تجزئة البيانات في كل تشغيل
+    base_version = st.session_state.get('df_version') or dataset_version(st.session_state.df)
+    version = f"{base_version}-{filter_signature({'الادارة': sorted(selected_dept)} if selected_dept else None)}"
+
+    # الفروع الموسعة: تُعرض المستويات العليا فقط ويوسع المستخدم ما يحتاجه
+    tree = get_org_hierarchy(version, df)
+    expandable = [
+        node_id for node_id, depth in zip(tree['ids'], tree['depths'])
+        if 0 < depth < len(tree['levels']) and tree['children'][node_id]
+    ]
+    expanded = st.sidebar.multiselect(
+        "توسيع الفروع",
+        options=expandable,
+        format_func=node_path_label,
+        key="org_chart_expanded"
+    )
+
     # عرض المخطط
-    org_chart = create_org_chart(df)
+    org_chart = create_org_chart(
+        df,
+        color_scheme=ORG_CHART_COLOR_SCHEMES[color_scheme],
+        style=ORG_CHART_STYLES[chart_style],
+        show_details="عدد الموظفين" in show_stats,
+        expanded=expanded,
+        version=version,
+    )
     if org_chart:
         st.plotly_chart(org_chart, use_container_width=True)
 
     # أزرار التصدير
     col1, col2 = st.columns(2)
     with col1:
-        if st.button("تصدير كملف PowerPoint", key=generate_unique_key("export_pptx", "export_section", 1)):
-            pptx_buffer = create_org_chart_pptx(df)
-            st.download_button(
-                label="تحميل العرض التقديمي",
-                data=pptx_buffer,
-                file_name="organizational_structure.pptx",
-                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
-            )
+        show_pptx_export(df, version)
 
     # إحصائيات عامة
     st.markdown("### 📊 إحصائيات الهيكل التنظيمي")
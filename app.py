@@ -1,19 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import base64
 import os
 from datetime import datetime
-from auth import init_auth, show_login, show_admin_panel, login_required, admin_required, is_admin
-from utils import load_excel_file, save_excel_file, apply_filters
+from bootstrap import get_app_resources, render_page_chrome
+from profiling import begin_rerun, show_profiling_panel
+from auth import show_login, show_admin_panel, login_required, admin_required, is_admin
+from utils import load_excel_snapshot, apply_filters, apply_row_scope, dataset_version, dataset_metadata, filter_signature
 from components import display_data_table, create_search_filters, create_export_section
-from database import init_db, get_all_employees
-from db_admin import show_db_admin
-from dashboard import create_interactive_dashboard
-from advanced_analytics import display_advanced_analytics
-
-# Initialize authentication
-init_auth()
+from database import get_all_employees, get_employee_metadata, get_write_count
+from retirement import RETIREMENT_AGE, retirement_date
 
 # Set page configuration
 st.set_page_config(
@@ -23,74 +19,14 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Improved Arabic RTL support with custom HTML/CSS
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Tajawal:wght@400;500;700&display=swap');
-
-    * {
-        font-family: 'Tajawal', sans-serif;
-    }
-
-    .rtl {
-        direction: rtl;
-        text-align: right;
-    }
-
-    .centered {
-        text-align: center;
-    }
+# Database schema, admin account, logo and styles are set up once per process
+resources = get_app_resources()
 
-    h1, h2, h3, h4, h5, h6 {
-        font-family: 'Tajawal', sans-serif;
-        font-weight: 700;
-    }
+# Record the instrumented calls of this run for the performance panel
+begin_rerun()
 
-    .stButton>button {
-        font-family: 'Tajawal', sans-serif;
-        font-weight: 500;
-    }
-
-    div[data-testid="stVerticalBlock"] {
-        direction: rtl;
-    }
-
-    .logo-container {
-        display: flex;
-        justify-content: center;
-        margin-bottom: 1rem;
-    }
-
-    .header-container {
-        background-color: #f8f9fa;
-        padding: 1rem;
-        border-radius: 5px;
-        margin-bottom: 1rem;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-    }
-
-    .stTabs [data-baseweb="tab-list"] button [data-testid="stMarkdownContainer"] p {
-        font-size: 1.2rem;
-        font-weight: 500;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Logo and App title in a header section
-def get_image_as_base64(file_path):
-    with open(file_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode()
-
-logo_base64 = get_image_as_base64("attached_assets/logo.png")
-
-st.markdown(f"""
-<div class="header-container">
-    <div class="logo-container">
-        <img src="data:image/png;base64,{logo_base64}" width="200">
-    </div>
-    <h1 class="centered">نظام إدارة بيانات الموظفين</h1>
-</div>
-""", unsafe_allow_html=True)
+# Arabic RTL styles and the logo header
+render_page_chrome(resources)
 
 # Initialize session state for storing dataframe
 if 'df' not in st.session_state:
@@ -121,17 +57,25 @@ def load_default_data():
     sample_file = "attached_assets/01.xlsx"
     try:
         if os.path.exists(sample_file):
-            df = load_excel_file(sample_file)
+            # المستخدم المقيد بنطاق يحتفظ بصفوف نطاقه فقط
+            df = apply_row_scope(load_excel_snapshot(sample_file), st.session_state.get('user_scope'))
             if df is not None:
                 st.session_state.df = df
+                st.session_state.df_version = dataset_version(df)
+                st.session_state.df_metadata = dataset_metadata(
+                    df, 'file', source_path=sample_file,
+                    modified_at=datetime.fromtimestamp(os.path.getmtime(sample_file))
+                )
                 st.session_state.filtered_df = df.copy()
+                st.session_state.filtered_metadata = st.session_state.df_metadata
+                st.session_state.filters_key = filter_signature(None)
                 return True
     except Exception as e:
         st.error(f'حدث خطأ أثناء تحميل ملف البيانات: {str(e)}')
     return False
 
-# Load data automatically on startup if not already loaded
-if 'df' not in st.session_state or st.session_state.df is None:
+# Load data automatically after login if not already loaded
+if st.session_state.get('logged_in', False) and st.session_state.df is None:
     load_default_data()
 
 # Sidebar with improved styling
@@ -152,56 +96,21 @@ with st.sidebar:
     if st.session_state.get('show_admin', False) and is_admin():
         show_admin_panel()
         st.stop()
-    # Improved sidebar styling
-    st.markdown("""
-    <style>
-    .sidebar-card {
-        background-color: #f8f9fa;
-        padding: 15px;
-        border-radius: 5px;
-        margin-bottom: 15px;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-    }
-    .sidebar-title {
-        color: #0e4c92;
-        font-weight: bold;
-        margin-bottom: 15px;
-        font-size: 1.2rem;
-        text-align: center;
-        border-bottom: 2px solid #0e4c92;
-        padding-bottom: 5px;
-    }
-    .stats-container {
-        background-color: #e9ecef;
-        padding: 10px;
-        border-radius: 5px;
-        margin-top: 15px;
-    }
-    .stats-item {
-        margin-bottom: 5px;
-        font-weight: 500;
-        font-size: 0.9rem;
-        text-align: right;
-    }
-    .stats-value {
-        font-weight: bold;
-        color: #0e4c92;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
     # File info section
     st.markdown('<div class="sidebar-card">', unsafe_allow_html=True)
     st.markdown('<h3 class="sidebar-title">معلومات الملف</h3>', unsafe_allow_html=True)
 
     if st.session_state.df is not None:
         st.success("تم تحميل البيانات بنجاح")
-        st.markdown(f'<p class="stats-item">اسم الملف: <span class="stats-value">attached_assets/01.xlsx</span></p>', unsafe_allow_html=True)
+        metadata = st.session_state.df_metadata
+        if metadata['source'] == 'database':
+            st.markdown('<p class="stats-item">المصدر: <span class="stats-value">قاعدة البيانات</span></p>', unsafe_allow_html=True)
+        else:
+            st.markdown(f'<p class="stats-item">اسم الملف: <span class="stats-value">{metadata["source_path"]}</span></p>', unsafe_allow_html=True)
 
-        # Get file modification time
-        file_time = os.path.getmtime("attached_assets/01.xlsx")
-        file_time_str = datetime.fromtimestamp(file_time).strftime('%Y-%m-%d %H:%M:%S')
-        st.markdown(f'<p class="stats-item">تاريخ آخر تعديل: <span class="stats-value">{file_time_str}</span></p>', unsafe_allow_html=True)
+        if metadata['modified_at'] is not None:
+            file_time_str = pd.Timestamp(metadata['modified_at']).strftime('%Y-%m-%d %H:%M:%S')
+            st.markdown(f'<p class="stats-item">تاريخ آخر تعديل: <span class="stats-value">{file_time_str}</span></p>', unsafe_allow_html=True)
     else:
         st.error("فشل في تحميل البيانات")
 
@@ -219,46 +128,19 @@ with st.sidebar:
 
         st.markdown('<div class="stats-container">', unsafe_allow_html=True)
 
-        # Employee count
-        st.markdown(f'<p class="stats-item">عدد الموظفين: <span class="stats-value">{len(st.session_state.df)}</span></p>', unsafe_allow_html=True)
-
-        # Departments count
-        if 'department' in st.session_state.df.columns:
-            dept_counts = st.session_state.df['department'].value_counts()
-            st.markdown(f'<p class="stats-item">عدد الإدارات: <span class="stats-value">{len(dept_counts)}</span></p>', unsafe_allow_html=True)
-
-        # Job categories count
-        if 'job_category' in st.session_state.df.columns:
-            job_cat_counts = st.session_state.df['job_category'].value_counts()
-            st.markdown(f'<p class="stats-item">عدد الفئات الوظيفية: <span class="stats-value">{len(job_cat_counts)}</span></p>', unsafe_allow_html=True)
-
-        # Workplaces count
-        if 'workplace' in st.session_state.df.columns:
-            workplace_counts = st.session_state.df['workplace'].value_counts()
-            st.markdown(f'<p class="stats-item">عدد مواقع العمل: <span class="stats-value">{len(workplace_counts)}</span></p>', unsafe_allow_html=True)
+        # Counts computed once when the data was loaded
+        metadata = st.session_state.df_metadata
+        st.markdown(f'<p class="stats-item">عدد الموظفين: <span class="stats-value">{metadata["rows"]}</span></p>', unsafe_allow_html=True)
+        for dimension, label in (('department', 'عدد الإدارات'), ('job_category', 'عدد الفئات الوظيفية'), ('workplace', 'عدد مواقع العمل')):
+            if metadata['distinct'][dimension] is not None:
+                st.markdown(f'<p class="stats-item">{label}: <span class="stats-value">{metadata["distinct"][dimension]}</span></p>', unsafe_allow_html=True)
 
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
-# Initialize the database
+# Database features are enabled when a database is configured and its schema is ready
 if 'db_initialized' not in st.session_state:
-    if os.environ.get("DATABASE_URL"):
-        success = init_db()
-        if success:
-            st.session_state.db_initialized = True
-        else:
-            st.session_state.db_initialized = False
-    else:
-        st.session_state.db_initialized = False
-
-# Main navigation
-if 'current_view' not in st.session_state:
-    st.session_state.current_view = "main"
-
-# Main area navigation
-main_tabs = ["البحث بالرقم الوظيفي", "عرض البيانات", "البحث والتصفية", "لوحة التحليلات التفاعلية", "الهيكل التنظيمي", "التصدير والتقارير"]
-if st.session_state.db_initialized:
-    main_tabs.append("إدارة قاعدة البيانات")
+    st.session_state.db_initialized = bool(os.environ.get("DATABASE_URL")) and resources['db_ready']
 
 # Add database admin button to sidebar if database is initialized
 if st.session_state.db_initialized:
@@ -274,274 +156,234 @@ if st.session_state.db_initialized:
         )
 
         if data_source == "قاعدة البيانات":
-            # Use data from database
+            # One aggregate query per rerun; the table is loaded again only
+            # when the scope or the employees have changed since the last load
+            scope = st.session_state.get('user_scope')
             try:
-                db_df = get_all_employees()
-                if not db_df.empty:
-                    st.session_state.df = db_df
-                    st.session_state.filtered_df = db_df.copy()
-                    st.success("تم تحميل البيانات من قاعدة البيانات")
-                else:
+                metadata = get_employee_metadata(scope=scope)
+                load_key = (scope, metadata['rows'], metadata['modified_at'], get_write_count())
+                if metadata['rows'] == 0:
                     st.warning("لا توجد بيانات في قاعدة البيانات")
                     # Switch back to file mode if no data
                     st.session_state.data_source = "الملف المحمل"
+                elif st.session_state.get('db_load_key') != load_key:
+                    db_df = get_all_employees(scope=scope)
+                    st.session_state.df = db_df
+                    st.session_state.df_version = dataset_version(db_df)
+                    st.session_state.df_metadata = metadata
+                    st.session_state.filtered_df = db_df.copy()
+                    st.session_state.filtered_metadata = metadata
+                    st.session_state.filters_key = filter_signature(None)
+                    st.session_state.db_load_key = load_key
+                    # Redraw the sidebar statistics above with the new data
+                    st.rerun()
+                else:
+                    st.success("تم تحميل البيانات من قاعدة البيانات")
             except Exception as e:
                 st.error(f"حدث خطأ أثناء قراءة قاعدة البيانات: {str(e)}")
                 st.session_state.data_source = "الملف المحمل"
+        elif st.session_state.pop('db_load_key', None) is not None:
+            # Back to the file after showing the database
+            load_default_data()
+            st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
-# Main area
-if st.session_state.df is not None:
-    # Create tabs for different functionalities
-    tabs = st.tabs(main_tabs)
-
-    with tabs[0]:
-        st.markdown("""
-        <style>
-        .employee-search {
-            background-color: #f8f9fa;
-            padding: 30px;
-            border-radius: 15px;
-            border: 2px solid #0e4c92;
-            margin-bottom: 20px;
-        }
-        .search-title {
-            color: #0e4c92;
-            font-size: 24px;
-            font-weight: bold;
-            text-align: center;
-            margin-bottom: 20px;
-            padding-bottom: 10px;
-            border-bottom: 2px solid #e9ecef;
-        }
-        .search-instruction {
-            color: #6c757d;
-            text-align: center;
-            margin-bottom: 15px;
-            font-size: 16px;
-        }
-        .employee-card {
-            background-color: white;
-            padding: 25px;
-            border-radius: 12px;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-            margin: 25px 0;
-            border-right: 5px solid #0e4c92;
-        }
-        .info-section {
-            margin: 15px 0;
-            padding: 15px;
-            background-color: #f8f9fa;
-            border-radius: 8px;
-        }
-        .info-title {
-            color: #0e4c92;
-            font-size: 18px;
-            font-weight: bold;
-            margin-bottom: 10px;
-            padding-bottom: 5px;
-            border-bottom: 2px solid #e9ecef;
-        }
-        .info-item {
-            margin: 8px 0;
-            padding: 5px 0;
-            border-bottom: 1px solid #e9ecef;
-        }
-        .print-button {
-            background-color: #0e4c92;
-            color: white;
-            padding: 10px 20px;
-            border-radius: 5px;
-            text-align: center;
-            cursor: pointer;
-            margin: 10px 0;
-        }
-        @media print {
-            .employee-card {
-                break-inside: avoid;
-                border: 1px solid #ccc;
-                padding: 20px;
-                margin: 0;
-                width: 100%;
-                box-shadow: none;
-            }
-            .info-section {
-                background-color: white;
-                border: 1px solid #e9ecef;
-            }
-            * {
-                font-family: 'Tajawal', sans-serif !important;
-            }
-            .no-print {
-                display: none !important;
-            }
-        }
-        </style>
-        """, unsafe_allow_html=True)
-
-        st.markdown('<h3 class="search-title">البحث بالرقم الوظيفي</h3>', unsafe_allow_html=True)
-        st.markdown('<p class="search-instruction">قم بإدخال الرقم الوظيفي للموظف للبحث عن بياناته</p>', unsafe_allow_html=True)
-
-        emp_id = st.text_input(
-            "الرقم الوظيفي",
-            placeholder="أدخل الرقم الوظيفي هنا...",
-            key="employee_search_id_1",
-            label_visibility="collapsed"
-        )
-
-        if emp_id:
-            employee_data = st.session_state.df[st.session_state.df['الرقم الوظيفي'] == emp_id]
-            if not employee_data.empty:
-                employee = employee_data.iloc[0]
-
-                if pd.notna(employee['تاريخ الميلاد']):
-                    birth_date = pd.to_datetime(employee['تاريخ الميلاد'])
-                    current_age = (pd.Timestamp.now() - birth_date).days / 365.25
-                    remaining_years = 65 - current_age
-
-                    # Create two columns for layout
-                    col1, col2 = st.columns([2, 1])
-
-                    with col1:
-                        # Display data in a styled table
+# Employee ID lookup: typing an ID or printing reruns this region only
+@st.fragment
+def show_employee_lookup():
+    st.markdown('<h3 class="search-title">البحث بالرقم الوظيفي</h3>', unsafe_allow_html=True)
+    st.markdown('<p class="search-instruction">قم بإدخال الرقم الوظيفي للموظف للبحث عن بياناته</p>', unsafe_allow_html=True)
+
+    emp_id = st.text_input(
+        "الرقم الوظيفي",
+        placeholder="أدخل الرقم الوظيفي هنا...",
+        key="employee_search_id_1",
+        label_visibility="collapsed"
+    )
+
+    if emp_id:
+        employee_data = st.session_state.df[st.session_state.df['الرقم الوظيفي'] == emp_id]
+        if not employee_data.empty:
+            employee = employee_data.iloc[0]
+
+            if pd.notna(employee['تاريخ الميلاد']):
+                birth_date = pd.to_datetime(employee['تاريخ الميلاد'])
+                current_age = (pd.Timestamp.now() - birth_date).days / 365.25
+                remaining_years = RETIREMENT_AGE - current_age
+
+                # Create two columns for layout
+                col1, col2 = st.columns([2, 1])
+
+                with col1:
+                    # Display data in a styled table
+                    table_html = f"""
+                    <table class="employee-table">
+                        <tr><th colspan="2">البيانات الأساسية</th></tr>
+                        <tr><td>الاسم</td><td>{employee['الاســــــــــــــــــــــــم']}</td></tr>
+                        <tr><td>الرقم الوظيفي</td><td>{employee['الرقم الوظيفي']}</td></tr>
+                        <tr><td>الرقم الوطني</td><td>{employee[' الرقم الوطني']}</td></tr>
+                        <tr><th colspan="2">معلومات العمل</th></tr>
+                        <tr><td>الإدارة</td><td>{employee['الادارة']}</td></tr>
+                        <tr><td>الوظيفة</td><td>{employee['الوظيفة']}</td></tr>
+                        <tr><td>الفئة الوظيفية</td><td>{employee['فئة الوظيفة']}</td></tr>
+                        <tr><td>موقع العمل</td><td>{employee['موقع العمل']}</td></tr>
+                        <tr><td>التابعية</td><td>{employee['التابعية']}</td></tr>
+                        <tr><th colspan="2">المعلومات الشخصية</th></tr>
+                        <tr><td>المؤهل العلمي</td><td>{employee['المؤهل العلمي']}</td></tr>
+                        <tr><td>تاريخ الميلاد</td><td>{birth_date.strftime('%Y-%m-%d')}</td></tr>
+                        <tr><td>مكان الميلاد</td><td>{employee['مكان الميلاد']}</td></tr>
+                        <tr><td>العمر الحالي</td><td>{current_age:.1f} سنة</td></tr>
+                        <tr><td>تاريخ التقاعد</td><td>{retirement_date(birth_date).strftime('%Y-%m-%d')}</td></tr>
+                    </table>
+                    """
+                    st.markdown(table_html, unsafe_allow_html=True)
+
+                    # Print button
+                    if st.button("🖨️ طباعة البيانات"):
                         st.markdown("""
                         <style>
-                        .employee-table {
-                            width: 100%;
-                            border-collapse: collapse;
-                            margin: 20px 0;
-                            font-size: 16px;
-                            box-shadow: 0 0 20px rgba(0, 0, 0, 0.1);
-                            border-radius: 10px;
-                            overflow: hidden;
-                        }
-                        .employee-table th {
-                            background-color: #0e4c92;
-                            color: white;
-                            padding: 12px;
-                            text-align: right;
-                        }
-                        .employee-table td {
-                            padding: 12px;
-                            border-bottom: 1px solid #ddd;
-                        }
-                        .employee-table tr:nth-child(even) {
-                            background-color: #f8f9fa;
-                        }
-                        .employee-table tr:hover {
-                            background-color: #f5f5f5;
+                        @media print {
+                            .stApp { display: block !important; }
+                            .stButton, [class*="css-"] { display: none !important; }
+                            .employee-table { box-shadow: none; }
                         }
                         </style>
                         """, unsafe_allow_html=True)
 
-                        # Create table HTML
-                        table_html = f"""
-                        <table class="employee-table">
-                            <tr><th colspan="2">البيانات الأساسية</th></tr>
-                            <tr><td>الاسم</td><td>{employee['الاســــــــــــــــــــــــم']}</td></tr>
-                            <tr><td>الرقم الوظيفي</td><td>{employee['الرقم الوظيفي']}</td></tr>
-                            <tr><td>الرقم الوطني</td><td>{employee[' الرقم الوطني']}</td></tr>
-                            <tr><th colspan="2">معلومات العمل</th></tr>
-                            <tr><td>الإدارة</td><td>{employee['الادارة']}</td></tr>
-                            <tr><td>الوظيفة</td><td>{employee['الوظيفة']}</td></tr>
-                            <tr><td>الفئة الوظيفية</td><td>{employee['فئة الوظيفة']}</td></tr>
-                            <tr><td>موقع العمل</td><td>{employee['موقع العمل']}</td></tr>
-                            <tr><td>التابعية</td><td>{employee['التابعية']}</td></tr>
-                            <tr><th colspan="2">المعلومات الشخصية</th></tr>
-                            <tr><td>المؤهل العلمي</td><td>{employee['المؤهل العلمي']}</td></tr>
-                            <tr><td>تاريخ الميلاد</td><td>{birth_date.strftime('%Y-%m-%d')}</td></tr>
-                            <tr><td>مكان الميلاد</td><td>{employee['مكان الميلاد']}</td></tr>
-                            <tr><td>العمر الحالي</td><td>{current_age:.1f} سنة</td></tr>
-                        </table>
-                        """
-                        st.markdown(table_html, unsafe_allow_html=True)
-
-                        # Print button
-                        if st.button("🖨️ طباعة البيانات"):
-                            st.markdown("""
-                            <style>
-                            @media print {
-                                .stApp { display: block !important; }
-                                .stButton, [class*="css-"] { display: none !important; }
-                                .employee-table { box-shadow: none; }
-                            }
-                            </style>
-                            """, unsafe_allow_html=True)
-
-                    with col2:
-                        # Create a pie chart for employment status
-                        import plotly.graph_objects as go
-                        
-                        fig = go.Figure(data=[go.Pie(
-                            labels=['سنوات الخدمة', 'السنوات المتبقية للتقاعد'],
-                            values=[current_age, remaining_years],
-                            hole=.3
-                        )])
-                        
-                        fig.update_layout(
-                            title="توزيع الخدمة الوظيفية",
-                            height=300,
-                            showlegend=True,
-                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-                        )
-                        
-                        st.plotly_chart(fig, use_container_width=True)
-
-                        # Add a progress bar for retirement
-                        st.markdown("### نسبة اكتمال سنوات الخدمة")
-                        progress = current_age / 65  # This will give a value between 0 and 1
-                        st.progress(min(progress, 1.0))
-                        st.write(f"نسبة اكتمال سنوات الخدمة: {progress * 100:.1f}%")
-                else:
-                    st.error("لا يوجد تاريخ ميلاد مسجل للموظف")
+                with col2:
+                    # Create a pie chart for employment status
+                    import plotly.graph_objects as go
+
+                    fig = go.Figure(data=[go.Pie(
+                        labels=['سنوات الخدمة', 'السنوات المتبقية للتقاعد'],
+                        values=[current_age, remaining_years],
+                        hole=.3
+                    )])
+
+                    fig.update_layout(
+                        title="توزيع الخدمة الوظيفية",
+                        height=300,
+                        showlegend=True,
+                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+                    )
+
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    # Add a progress bar for retirement
+                    st.markdown("### نسبة اكتمال سنوات الخدمة")
+                    progress = current_age / RETIREMENT_AGE  # This will give a value between 0 and 1
+                    st.progress(min(progress, 1.0))
+                    st.write(f"نسبة اكتمال سنوات الخدمة: {progress * 100:.1f}%")
             else:
-                st.error("لم يتم العثور على موظف بهذا الرقم الوظيفي")
+                st.error("لا يوجد تاريخ ميلاد مسجل للموظف")
+        else:
+            st.error("لم يتم العثور على موظف بهذا الرقم الوظيفي")
 
-        st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-    with tabs[1]:
-        st.markdown('<h3 class="rtl">بيانات الموظفين</h3>', unsafe_allow_html=True)
-        # Display the data table with pagination
-        display_data_table(st.session_state.filtered_df, st.session_state.columns_mapping)
-
-    with tabs[2]:
-        st.markdown('<h3 class="rtl">البحث والتصفية</h3>', unsafe_allow_html=True)
-        # Create search and filter interface
-        filters = create_search_filters(st.session_state.df, st.session_state.columns_mapping)
-
-        # Apply filters button
-        if st.button("تطبيق التصفية"):
-            st.session_state.filtered_df = apply_filters(st.session_state.df, filters)
-            st.success(f'تم تصفية البيانات. تم العثور على {len(st.session_state.filtered_df)} موظف.')
-
-        # Reset filters button
-        if st.button("إعادة تعيين التصفية"):
-            st.session_state.filtered_df = st.session_state.df.copy()
-            st.success('تم إعادة تعيين التصفية.')
-            st.rerun()
 
-    with tabs[3]:
-        st.markdown('<h3 class="rtl">لوحة التحليلات التفاعلية</h3>', unsafe_allow_html=True)
-        # Create interactive dashboard
-        create_interactive_dashboard(st.session_state.filtered_df)
+#-------------------------------------
+# واجهات الصفحة الرئيسية
+#-------------------------------------
+def show_data_view():
+    st.markdown('<h3 class="rtl">بيانات الموظفين</h3>', unsafe_allow_html=True)
+    # Display the data table with pagination
+    display_data_table(
+        st.session_state.filtered_df,
+        st.session_state.columns_mapping,
+        version=st.session_state.get('df_version'),
+        filters_key=st.session_state.get('filters_key')
+    )
+
+
+def show_filters_view():
+    st.markdown('<h3 class="rtl">البحث والتصفية</h3>', unsafe_allow_html=True)
+    # Create search and filter interface
+    filters = create_search_filters(st.session_state.df, st.session_state.columns_mapping)
+
+    # Apply filters button
+    if st.button("تطبيق التصفية"):
+        st.session_state.filtered_df = apply_filters(st.session_state.df, filters)
+        st.session_state.filtered_metadata = dataset_metadata(
+            st.session_state.filtered_df, st.session_state.df_metadata['source'],
+            st.session_state.df_metadata['source_path'], st.session_state.df_metadata['modified_at']
+        )
+        st.session_state.filters_key = filter_signature(filters)
+        st.session_state.data_table_page = 1
+        st.success(f'تم تصفية البيانات. تم العثور على {len(st.session_state.filtered_df)} موظف.')
+
+    # Reset filters button
+    if st.button("إعادة تعيين التصفية"):
+        st.session_state.filtered_df = st.session_state.df.copy()
+        st.session_state.filtered_metadata = st.session_state.df_metadata
+        st.session_state.filters_key = filter_signature(None)
+        st.session_state.data_table_page = 1
+        st.success('تم إعادة تعيين التصفية.')
+        st.rerun()
+
+
+def show_dashboard_view():
+    st.markdown('<h3 class="rtl">لوحة التحليلات التفاعلية</h3>', unsafe_allow_html=True)
+    # View modules and their plotting dependencies are imported on first use
+    from dashboard import create_interactive_dashboard
+    create_interactive_dashboard(st.session_state.filtered_df, st.session_state.get('filtered_metadata'))
+
+
+def show_org_chart_view():
+    st.markdown('<h3 class="rtl">الهيكل التنظيمي</h3>', unsafe_allow_html=True)
+    # عرض الهيكل التنظيمي
+    from advanced_analytics import display_advanced_analytics
+    display_advanced_analytics()
+
+
+def show_notifications_view():
+    from notifications import display_notifications
+    display_notifications()
+
+
+def show_export_view():
+    st.markdown('<h3 class="rtl">التصدير والتقارير</h3>', unsafe_allow_html=True)
+    if st.session_state.filtered_df is not None and not st.session_state.filtered_df.empty:
+        create_export_section(
+            st.session_state.filtered_df,
+            version=st.session_state.get('df_version'),
+            filters_key=st.session_state.get('filters_key')
+        )
+    else:
+        st.warning("لا توجد بيانات متاحة للتصدير")
 
-    with tabs[4]:
-        st.markdown('<h3 class="rtl">الهيكل التنظيمي</h3>', unsafe_allow_html=True)
-        # عرض الهيكل التنظيمي
-        display_advanced_analytics()
 
-    with tabs[5]:
-        st.markdown('<h3 class="rtl">التصدير والتقارير</h3>', unsafe_allow_html=True)
-        if st.session_state.filtered_df is not None and not st.session_state.filtered_df.empty:
-            create_export_section(st.session_state.filtered_df)
-        else:
-            st.warning("لا توجد بيانات متاحة للتصدير")
+def show_db_admin_view():
+    from db_admin import show_db_admin
+    show_db_admin()
+
 
-    # Database admin tab if database is initialized
-    if st.session_state.db_initialized and len(main_tabs) > 5:
-        with tabs[6]:
-            show_db_admin()
+# Main area
+if st.session_state.df is not None:
+    # (label, view) pairs; the database view needs a configured database and
+    # the performance panel is for admins only
+    main_views = [
+        ("البحث بالرقم الوظيفي", show_employee_lookup),
+        ("عرض البيانات", show_data_view),
+        ("البحث والتصفية", show_filters_view),
+        ("لوحة التحليلات التفاعلية", show_dashboard_view),
+        ("الهيكل التنظيمي", show_org_chart_view),
+        ("التنبيهات", show_notifications_view),
+        ("التصدير والتقارير", show_export_view),
+    ]
+    # الاستيراد والتعديل والحذف تمس الجدول كاملاً، لذا تقتصر على المشرفين
+    if st.session_state.db_initialized and is_admin():
+        main_views.append(("إدارة قاعدة البيانات", show_db_admin_view))
+    if is_admin():
+        main_views.append(("أداء التطبيق", show_profiling_panel))
+
+    # Selecting a tab reruns the app and only the open tab's view is executed
+    tabs = st.tabs([label for label, _ in main_views], key="main_view", on_change="rerun")
+    for tab, (label, show_view) in zip(tabs, main_views):
+        if tab.open:
+            with tab:
+                show_view()
 else:
     # Display welcome screen with nicer styling and instructions
     st.markdown("""
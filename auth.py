@@ -1,9 +1,19 @@
 
 import streamlit as st
-from database import engine, Base
-from sqlalchemy import Column, Integer, String, Boolean
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from database import engine, Base, ROW_SCOPE_COLUMNS
+from rate_limit import check_login_attempt, reset_login_attempts, get_rate_limit_stats
+from sqlalchemy import Column, Integer, String, Boolean, inspect, text
 from sqlalchemy.orm import sessionmaker
+import os
+import math
+import base64
+import binascii
 import hashlib
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 class User(Base):
     __tablename__ = 'users'
@@ -12,35 +22,267 @@ class User(Base):
     employee_id = Column(String(50), unique=True, nullable=False)
     password_hash = Column(String(128), nullable=False)
     is_admin = Column(Boolean, default=False)
+    # نطاق البيانات: المستخدم غير المشرف يرى موظفي إدارة أو تابعية واحدة فقط
+    scope_column = Column(String(50), nullable=True)
+    scope_value = Column(String(255), nullable=True)
     
     def __repr__(self):
         return f"<User(employee_id='{self.employee_id}')>"
 
+SCOPE_LABELS = {None: 'كل البيانات', 'department': 'إدارة', 'affiliation': 'تابعية'}
+
+# Sessions come from the engine's connection pool instead of a new sessionmaker per call
+Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+# Users are cached per process; the cache is dropped after any change made
+# through this module and refreshed after USER_CACHE_TTL_SECONDS to pick up
+# changes made by other processes.
+USER_CACHE_TTL_SECONDS = 300
+
+_auth_lock = threading.Lock()
+_auth_initialized = False
+_user_cache = None
+_user_cache_loaded_at = 0.0
+
+
+#-------------------------------------
+# تجزئة كلمات المرور
+#-------------------------------------
+# Stored format: scheme$parameters...$salt$hash (salt and hash base64-encoded).
+# Hashes with other parameters, and legacy unsalted SHA-256 hex digests, are
+# upgraded on the next successful login.
+PASSWORD_HASH_SCHEME = 'scrypt' if hasattr(hashlib, 'scrypt') else 'pbkdf2_sha256'
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600000
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _derive(scheme, params, password, salt):
+    if scheme == 'scrypt':
+        n, r, p = params
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=HASH_BYTES,
+                              maxmem=128 * r * n * 2)
+    if scheme == 'pbkdf2_sha256':
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, dklen=HASH_BYTES)
+    raise ValueError(f"Unknown password hash scheme: {scheme}")
+
+
+def _current_params():
+    if PASSWORD_HASH_SCHEME == 'scrypt':
+        return (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return (PBKDF2_ITERATIONS,)
+
+
+def hash_password(password):
+    """Hash a password with a random salt and the current KDF parameters."""
+    params = _current_params()
+    salt = os.urandom(SALT_BYTES)
+    derived = _derive(PASSWORD_HASH_SCHEME, params, password, salt)
+    return '$'.join([PASSWORD_HASH_SCHEME, *map(str, params), _b64(salt), _b64(derived)])
+
+
+def check_password(password, stored_hash):
+    """
+    Check a password against a stored hash in constant time.
+
+    A malformed stored hash never matches.
+
+    Returns:
+        tuple: (matches, needs_rehash) where needs_rehash is True for legacy
+        SHA-256 hashes and for hashes made with other KDF parameters
+    """
+    parts = stored_hash.split('$')
+    if len(parts) == 1:
+        # تجزئة SHA-256 القديمة بدون ملح
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(stored_hash.encode(), legacy.encode()), True
+
+    try:
+        scheme, *params, salt, expected = parts
+        params = tuple(int(value) for value in params)
+        derived = _derive(scheme, params, password, base64.b64decode(salt))
+        matches = hmac.compare_digest(derived, base64.b64decode(expected))
+    except (ValueError, binascii.Error):
+        return False, False
+    return matches, (scheme, params) != (PASSWORD_HASH_SCHEME, _current_params())
+
+
+#-------------------------------------
+# مجمع عمال التحقق من كلمات المرور
+#-------------------------------------
+# KDF work runs in a small pool so that a burst of logins uses at most
+# VERIFY_WORKERS cores; hashlib releases the GIL while deriving, so script
+# threads of users who are already logged in keep rendering.
+VERIFY_WORKERS = 2
+# Logins waiting beyond this depth are refused instead of queued
+MAX_PENDING_VERIFICATIONS = 32
+VERIFY_TIMEOUT_SECONDS = 30
+
+_verify_executor = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix='password-verify')
+_verify_stats = {'pending': 0, 'completed': 0, 'rejected': 0, 'rehashed': 0}
+_dummy_hash = None
+
+
+class VerificationBusy(Exception):
+    """Raised when too many password verifications are already queued."""
+
+
+def get_verification_stats():
+    """
+    Counters of the verification pool.
+
+    Returns:
+        dict: 'pending' (queue depth including running checks), 'completed'
+        (checks that finished without an error), 'rejected' (refused because
+        the queue was full) and 'rehashed'
+    """
+    with _auth_lock:
+        return dict(_verify_stats)
+
+
+def _verification_done(future):
+    """Release the queue slot of a check once it has really finished."""
+    finished = not future.cancelled() and future.exception() is None
+    with _auth_lock:
+        _verify_stats['pending'] -= 1
+        if finished:
+            _verify_stats['completed'] += 1
+
+
+def _verify_in_worker(employee_id, password):
+    global _dummy_hash
+    user = _get_users().get(employee_id)
+    if user is None:
+        # نفس كلفة التحقق للمستخدم غير الموجود كي لا يكشف الزمن وجوده
+        if _dummy_hash is None:
+            _dummy_hash = hash_password('dummy-password')
+        check_password(password, _dummy_hash)
+        return None
+
+    matches, needs_rehash = check_password(password, user.password_hash)
+    if not matches:
+        return None
+
+    if needs_rehash:
+        new_hash = hash_password(password)
+        session = Session()
+        try:
+            session.query(User).filter_by(employee_id=employee_id).update({'password_hash': new_hash})
+            session.commit()
+        finally:
+            session.close()
+        invalidate_user_cache()
+        with _auth_lock:
+            _verify_stats['rehashed'] += 1
+    return user
+
+
+def _add_missing_user_columns():
+    """Add the scope columns to a users table created before they existed."""
+    existing = {column['name'] for column in inspect(engine).get_columns('users')}
+    with engine.begin() as connection:
+        for name, ddl in (('scope_column', 'VARCHAR(50)'), ('scope_value', 'VARCHAR(255)')):
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE users ADD COLUMN {name} {ddl}"))
+
+
+def user_scope(user):
+    """
+    Row scope of a user.
+
+    Returns:
+        tuple or None: (column, value) for scoped users, None for admins and
+        users without a scope
+    """
+    if user.is_admin or not user.scope_column or not user.scope_value:
+        return None
+    return (user.scope_column, user.scope_value)
+
+
 def init_auth():
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
+    """Create the users table and the main admin account, once per process."""
+    global _auth_initialized
+    with _auth_lock:
+        if _auth_initialized:
+            return
+
+        Base.metadata.create_all(engine)
+        _add_missing_user_columns()
+        session = Session()
+        try:
+            # Create admin user if not exists
+            admin = session.query(User).filter_by(employee_id='Stickyfingaz420').first()
+            if not admin:
+                password = 'Fuckthafucknworld'
+                password_hash = hash_password(password)
+                admin = User(employee_id='Stickyfingaz420', password_hash=password_hash, is_admin=True)
+                session.add(admin)
+                session.commit()
+        finally:
+            session.close()
+
+        _auth_initialized = True
+
+
+def _get_users():
+    """Return the cached {employee_id: User} mapping, loading it with one query when stale."""
+    global _user_cache, _user_cache_loaded_at
+    with _auth_lock:
+        if _user_cache is not None and time.monotonic() - _user_cache_loaded_at < USER_CACHE_TTL_SECONDS:
+            return _user_cache
+
     session = Session()
-    
-    # Create admin user if not exists
-    admin = session.query(User).filter_by(employee_id='Stickyfingaz420').first()
-    if not admin:
-        password = 'Fuckthafucknworld'
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        admin = User(employee_id='Stickyfingaz420', password_hash=password_hash, is_admin=True)
-        session.add(admin)
-        session.commit()
-    
-    session.close()
+    try:
+        users = {user.employee_id: user for user in session.query(User).all()}
+    finally:
+        session.close()
+
+    with _auth_lock:
+        _user_cache = users
+        _user_cache_loaded_at = time.monotonic()
+    return users
+
+
+def invalidate_user_cache():
+    """Drop the cached users after adding, changing or deleting accounts."""
+    global _user_cache
+    with _auth_lock:
+        _user_cache = None
+
 
 def verify_user(employee_id, password):
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    user = session.query(User).filter_by(employee_id=employee_id).first()
-    session.close()
-    
-    if user and user.password_hash == hashlib.sha256(password.encode()).hexdigest():
-        return user
-    return None
+    """
+    Verify credentials in the verification pool.
+
+    Returns:
+        User or None
+
+    Raises:
+        VerificationBusy: when MAX_PENDING_VERIFICATIONS checks are already queued
+    """
+    with _auth_lock:
+        if _verify_stats['pending'] >= MAX_PENDING_VERIFICATIONS:
+            _verify_stats['rejected'] += 1
+            raise VerificationBusy()
+        _verify_stats['pending'] += 1
+
+    try:
+        future = _verify_executor.submit(_verify_in_worker, employee_id, password)
+    except RuntimeError:
+        with _auth_lock:
+            _verify_stats['pending'] -= 1
+        raise
+    # A check that times out here keeps its slot until the worker is done with it
+    future.add_done_callback(_verification_done)
+    return future.result(timeout=VERIFY_TIMEOUT_SECONDS)
 
 def is_admin():
     return st.session_state.get('is_admin', False)
@@ -62,6 +304,32 @@ def admin_required(func):
         return func(*args, **kwargs)
     return wrapper
 
+# عناوين الوكلاء العكسيين الموثوقين مفصولة بفواصل؛ لا يُعتمد X-Forwarded-For إلا من خلفها
+TRUSTED_PROXIES = {
+    address.strip() for address in os.environ.get("LOGIN_TRUSTED_PROXIES", "").split(",") if address.strip()
+}
+
+def _client_id():
+    """
+    Identify the client of the current session for login rate limiting.
+
+    X-Forwarded-For is set by the client unless a proxy overwrites it, so it
+    is only honoured when the connection comes from one of TRUSTED_PROXIES,
+    and then only the hops appended by those proxies are read. Without the
+    peer address (older Streamlit versions) the session id is used.
+    """
+    peer = getattr(st.context, 'ip_address', None)
+    forwarded = st.context.headers.get('X-Forwarded-For') if st.context.headers else None
+    if peer in TRUSTED_PROXIES and forwarded:
+        # من اليمين: كل وكيل موثوق يضيف عنوان من اتصل به
+        for hop in reversed([hop.strip() for hop in forwarded.split(',') if hop.strip()]):
+            if hop not in TRUSTED_PROXIES:
+                return hop
+    if peer:
+        return peer
+    ctx = get_script_run_ctx()
+    return f"session:{ctx.session_id}" if ctx is not None else 'unknown'
+
 def show_login():
     st.markdown('<h2 style="text-align: center;">تسجيل الدخول</h2>', unsafe_allow_html=True)
     
@@ -71,11 +339,24 @@ def show_login():
         submitted = st.form_submit_button("دخول")
         
         if submitted:
-            user = verify_user(employee_id, password)
+            # رفض المحاولات الزائدة قبل أي استعلام أو عملية تجزئة
+            allowed, retry_after = check_login_attempt(employee_id, _client_id())
+            if not allowed:
+                st.error(f'تم تجاوز عدد محاولات الدخول المسموح بها، يرجى المحاولة بعد {math.ceil(retry_after)} ثانية')
+                return
+            try:
+                user = verify_user(employee_id, password)
+            except (VerificationBusy, FutureTimeoutError):
+                st.warning('النظام مشغول بطلبات تسجيل دخول أخرى، يرجى المحاولة بعد لحظات')
+                return
             if user:
+                reset_login_attempts(employee_id)
                 st.session_state.logged_in = True
                 st.session_state.is_admin = user.is_admin
                 st.session_state.current_user = user.employee_id
+                st.session_state.user_scope = user_scope(user)
+                # إعادة تحميل البيانات ضمن نطاق المستخدم
+                st.session_state.df = None
                 st.success('تم تسجيل الدخول بنجاح')
                 st.rerun()
             else:
@@ -84,9 +365,6 @@ def show_login():
 def show_admin_panel():
     st.markdown('<h2 style="text-align: center;">لوحة التحكم</h2>', unsafe_allow_html=True)
     
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    
     tab1, tab2 = st.tabs(["إضافة مستخدم", "إدارة المستخدمين"])
     
     with tab1:
@@ -94,34 +372,68 @@ def show_admin_panel():
             new_employee_id = st.text_input("الرقم الوظيفي")
             new_password = st.text_input("كلمة المرور", type="password")
             is_admin = st.checkbox("مشرف النظام")
+            scope_column = st.selectbox(
+                "نطاق البيانات",
+                [None] + list(ROW_SCOPE_COLUMNS),
+                format_func=lambda col: SCOPE_LABELS[col]
+            )
+            scope_value = st.text_input("قيمة النطاق (اسم الإدارة أو التابعية)")
             submitted = st.form_submit_button("إضافة")
             
             if submitted:
-                if new_employee_id and new_password:
-                    password_hash = hashlib.sha256(new_password.encode()).hexdigest()
-                    new_user = User(employee_id=new_employee_id, password_hash=password_hash, is_admin=is_admin)
+                if scope_column and not scope_value.strip():
+                    st.error('يرجى إدخال قيمة النطاق')
+                elif new_employee_id and new_password:
+                    password_hash = hash_password(new_password)
+                    new_user = User(
+                        employee_id=new_employee_id, password_hash=password_hash, is_admin=is_admin,
+                        scope_column=scope_column, scope_value=scope_value.strip() if scope_column else None
+                    )
+                    session = Session()
                     session.add(new_user)
                     try:
                         session.commit()
+                        invalidate_user_cache()
                         st.success('تم إضافة المستخدم بنجاح')
                     except:
                         session.rollback()
                         st.error('خطأ: الرقم الوظيفي مستخدم مسبقاً')
+                    finally:
+                        session.close()
                 else:
                     st.error('يرجى تعبئة جميع الحقول')
     
     with tab2:
-        users = session.query(User).all()
+        stats = get_verification_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("طلبات تحقق في الانتظار", stats['pending'])
+        col2.metric("عمليات تحقق مكتملة", stats['completed'])
+        col3.metric("طلبات مرفوضة", stats['rejected'])
+        col4.metric("كلمات مرور محدثة", stats['rehashed'])
+
+        limits = get_rate_limit_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("محاولات دخول مسموحة", limits['allowed'])
+        col2.metric("مرفوضة (رقم وظيفي)", limits['rejected_employee'])
+        col3.metric("مرفوضة (عميل)", limits['rejected_client'])
+        col4.metric("دلاء نشطة", limits['tracked_buckets'])
+
+        users = sorted(_get_users().values(), key=lambda user: user.id)
         for user in users:
             col1, col2 = st.columns([3, 1])
             with col1:
-                st.write(f"الرقم الوظيفي: {user.employee_id} {'(مشرف)' if user.is_admin else ''}")
+                scope = user_scope(user)
+                scope_text = f"({SCOPE_LABELS[scope[0]]}: {scope[1]})" if scope else ''
+                st.write(f"الرقم الوظيفي: {user.employee_id} {'(مشرف)' if user.is_admin else ''} {scope_text}")
             with col2:
                 if user.employee_id != 'Stickyfingaz420':  # Don't allow deleting main admin
                     if st.button('حذف', key=f'del_{user.employee_id}'):
-                        session.delete(user)
-                        session.commit()
+                        session = Session()
+                        try:
+                            session.query(User).filter_by(employee_id=user.employee_id).delete()
+                            session.commit()
+                        finally:
+                            session.close()
+                        invalidate_user_cache()
                         st.success('تم حذف المستخدم')
                         st.rerun()
-    
-    session.close()
@@ -0,0 +1,115 @@
+"""
+Profile the imports of the app's cold start with python -X importtime.
+
+Usage:
+    python benchmarks/import_time.py [--top 15] [--budget-ms 1500]
+    python benchmarks/import_time.py --module advanced_analytics
+
+By default the app is run headless up to its first render (the login form)
+in a fresh interpreter, and only the imports made by the app are reported,
+not those of streamlit.testing. The run fails (exit status 1) when one of
+LAZY_MODULES was imported during that render or when the app's imports take
+longer than --budget-ms, so regressions in cold start are caught.
+
+With --module, a single module is imported instead and its heaviest
+dependencies are listed.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tab modules and heavy libraries that must be imported on first use only
+LAZY_MODULES = (
+    'dashboard', 'advanced_analytics', 'db_admin',
+    'pptx', 'openpyxl', 'xlsxwriter', 'plotly.express',
+)
+
+MARKER = '--- app imports ---'
+
+APP_SNIPPET = f"""
+import sys
+from streamlit.testing.v1 import AppTest
+sys.stderr.write({MARKER!r} + '\\n')
+at = AppTest.from_file('app.py', default_timeout=300)
+at.run()
+if at.exception:
+    raise SystemExit(at.exception[0].value)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output into (name, depth, self_us, cumulative_us) tuples.
+
+    Only the lines after MARKER are kept when the marker is present.
+    """
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+
+    imports = []
+    for line in lines:
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return imports
+
+
+def run_importtime(code):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONPATH': ROOT},
+    )
+    if result.returncode != 0:
+        sys.exit(f"profiled run failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', help="profile importing this module instead of the app's first render")
+    parser.add_argument('--top', type=int, default=15, help="number of heaviest imports to list")
+    parser.add_argument('--budget-ms', type=float, default=None, help="fail when the app's imports take longer")
+    args = parser.parse_args()
+
+    code = f"import {args.module}" if args.module else APP_SNIPPET
+    imports = run_importtime(code)
+
+    total_ms = sum(self_us for _, _, self_us, _ in imports) / 1000
+    print(f"{len(imports)} modules imported in {total_ms:.0f} ms\n")
+
+    # الاستيرادات الأثقل على المستوى الأعلى (الزمن التراكمي يشمل اعتمادياتها)
+    # (مع --module تُعرض اعتماديات الوحدة المباشرة بدلاً من الوحدة نفسها)
+    level = min((depth for _, depth, _, _ in imports), default=0) + (1 if args.module else 0)
+    heaviest = sorted(
+        (entry for entry in imports if entry[1] == level), key=lambda entry: entry[3], reverse=True
+    )[:args.top]
+    print(f"{'module':<40} {'cumulative':>12}")
+    for name, _, _, cumulative_us in heaviest:
+        print(f"{name:<40} {cumulative_us / 1000:9.1f} ms")
+
+    if args.module:
+        return
+
+    failures = []
+    imported = {name for name, _, _, _ in imports}
+    eager = [name for name in LAZY_MODULES if name in imported]
+    if eager:
+        failures.append("imported before first use: " + ", ".join(eager))
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"imports took {total_ms:.0f} ms, budget is {args.budget_ms:.0f} ms")
+
+    if failures:
+        print("\nFAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK: no lazy module was imported at startup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Measure the app's time-to-first-render and per-rerun overhead.
+
+Usage:
+    python benchmarks/startup.py [--reruns 20] [--user ID --password PASSWORD]
+
+The app is run headless with streamlit.testing in a fresh interpreter, so the
+first run includes importing every module and the one-time process startup
+(schema check, admin seeding, logo and styles). The following reruns show
+what each interaction costs once those resources are cached. With --user and
+--password the reruns are measured on the logged-in main view instead of the
+login form.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+def run(at):
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--user', help="employee ID to log in with")
+    parser.add_argument('--password')
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import_time = time.perf_counter() - started
+
+    at = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=args.timeout)
+    first_render = run(at)
+    print(f"{'import streamlit':<28} {import_time:8.3f} s")
+    print(f"{'time to first render':<28} {first_render:8.3f} s")
+
+    from bootstrap import get_app_resources
+    for name, seconds in get_app_resources()['timings'].items():
+        print(f"  {'startup: ' + name:<26} {seconds:8.3f} s")
+
+    view = 'login form'
+    if args.user:
+        at.text_input[0].input(args.user)
+        at.text_input[1].input(args.password or '')
+        at.button[0].click()
+        run(at)
+        login_time = run(at)
+        print(f"{'first run after login':<28} {login_time:8.3f} s")
+        view = 'main view'
+
+    times = [run(at) for _ in range(args.reruns)]
+    print(f"\n{args.reruns} reruns of the {view}:")
+    print(f"  {'median':<26} {statistics.median(times):8.3f} s")
+    print(f"  {'min':<26} {min(times):8.3f} s")
+    print(f"  {'max':<26} {max(times):8.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import base64
+import time
+import logging
+import streamlit as st
+from database import engine, init_db
+from auth import init_auth
+
+logger = logging.getLogger(__name__)
+
+LOGO_PATH = "attached_assets/logo.png"
+STYLES_PATH = "attached_assets/styles.css"
+
+
+#-------------------------------------
+# موارد العملية (تُهيأ مرة واحدة لكل عملية)
+#-------------------------------------
+def _timed(timings, name, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    timings[name] = time.perf_counter() - started
+    return result
+
+
+def _read_logo(path):
+    with open(path, "rb") as img_file:
+        return base64.b64encode(img_file.read()).decode()
+
+
+def _read_styles(path):
+    with open(path, encoding="utf-8") as css_file:
+        return f"<style>\n{css_file.read()}</style>"
+
+
+@st.cache_resource(show_spinner=False)
+def get_app_resources():
+    """
+    Initialise the process-wide resources of the app.
+
+    Runs once per server process, on the first session's first run: checks
+    the database schema, seeds the admin account and loads the logo and the
+    stylesheet. Every later rerun, in any session, gets the cached result.
+
+    Returns:
+        dict: 'engine', 'db_ready' (schema check result), 'logo_base64',
+        'styles' (one <style> block for the whole app) and 'timings'
+        (seconds spent in each startup step)
+    """
+    timings = {}
+    db_ready = _timed(timings, 'init_db', init_db)
+    _timed(timings, 'init_auth', init_auth)
+    logo_base64 = _timed(timings, 'logo', _read_logo, LOGO_PATH)
+    styles = _timed(timings, 'styles', _read_styles, STYLES_PATH)
+
+    logger.info("App startup: " + ", ".join(f"{name}={seconds:.3f}s" for name, seconds in timings.items()))
+    return {
+        'engine': engine,
+        'db_ready': db_ready,
+        'logo_base64': logo_base64,
+        'styles': styles,
+        'timings': timings,
+    }
+
+
+#-------------------------------------
+# عناصر الصفحة الثابتة
+#-------------------------------------
+def render_page_chrome(resources):
+    """Emit the stylesheet and the header of the page from the cached resources."""
+    st.markdown(resources['styles'], unsafe_allow_html=True)
+    st.markdown(f"""
+<div class="header-container">
+    <div class="logo-container">
+        <img src="data:image/png;base64,{resources['logo_base64']}" width="200">
+    </div>
+    <h1 class="centered">نظام إدارة بيانات الموظفين</h1>
+</div>
+""", unsafe_allow_html=True)
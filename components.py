@@ -1,49 +1,187 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta
 import base64
-import io
 import pandas as pd
-from utils import save_excel_file, convert_df_to_csv
-from io import BytesIO
-from openpyxl.styles import Font, Alignment, PatternFill
+from utils import deferred_export, streamed_export, serialize_export, available_export_formats, dataset_version, EXPORT_MIME_TYPES
+from reports import get_report_table, build_report_workbook, REPORT_SHEETS
+from jobs import submit_export, get_export
+from profiling import instrument
+from database import (
+    CUSTOM_REPORT_COLUMNS, count_custom_report, get_custom_report_page,
+    iter_custom_report, get_distinct_values
+)
+
+#-------------------------------------
+# لوحة مهام التصدير الخلفية
+#-------------------------------------
+def show_background_export(job_key, button_label, submit, mime, key, on_done=None):
+    """
+    Display a button that starts a background export, its status and the download
+
+    While the export is queued or running only this panel reruns, once per second.
+
+    Args:
+        job_key: Key of the export in the jobs module
+        button_label: Label of the button that starts the export
+        submit: Zero-argument function calling jobs.submit_export
+        mime: MIME type of the exported file
+        key: Unique prefix for the widget keys
+        on_done: Optional function receiving the export details once it is done
+    """
+    export = get_export(job_key)
+    polling = export is not None and export['status'] in ('pending', 'running')
+    st.fragment(_background_export_panel, run_every=1 if polling else None)(
+        job_key, button_label, submit, mime, key, on_done, polling
+    )
+
+
+def _background_export_panel(job_key, button_label, submit, mime, key, on_done, polling):
+    if st.button(button_label, key=f"{key}_start"):
+        if submit() is None:
+            st.warning("يوجد عدد كبير من عمليات التصدير الجارية، يرجى المحاولة بعد قليل")
+        elif not polling:
+            # إعادة التشغيل لتفعيل التحديث الدوري لحالة المهمة
+            st.rerun()
+
+    export = get_export(job_key)
+    if export is None:
+        return
+
+    if export['status'] == 'pending':
+        st.info("⏳ في انتظار دور التصدير...")
+    elif export['status'] == 'running':
+        st.progress(export['progress'], text=export['message'] or "جاري تجهيز الملف...")
+    elif export['status'] == 'failed':
+        st.error(f"تعذر تجهيز الملف: {export['error']}")
+    else:
+        if polling:
+            # انتهت المهمة: إيقاف التحديث الدوري
+            st.rerun()
+        st.download_button(
+            label="📥 تحميل الملف الجاهز",
+            data=_read_export_file(export['path']),
+            file_name=export['file_name'],
+            mime=mime,
+            key=f"{key}_download"
+        )
+        if on_done is not None:
+            on_done(export['details'])
+
+
+def _read_export_file(path):
+    """Read the exported file only when the download is clicked."""
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+    return read
+
+
+def _show_report_timings(timings):
+    if timings is not None:
+        with st.expander("⏱️ زمن إنشاء أوراق التقرير"):
+            st.dataframe(timings, hide_index=True)
+
+
+#-------------------------------------
+# تنسيق عرض الجدول
+#-------------------------------------
+def _schema_signature(df):
+    """Column names and dtypes of a DataFrame as a hashable cache key."""
+    return tuple((col, str(dtype)) for col, dtype in df.dtypes.items())
 
-def display_data_table(df, columns_mapping):
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _display_format_plan(schema):
+    """
+    Work out once per schema how a table page should be displayed
+
+    Args:
+        schema: Result of _schema_signature
+
+    Returns:
+        dict: 'columns' to show (unnamed columns dropped) and the Streamlit
+        'column_config', which formats dates in the browser instead of
+        converting them to strings in pandas
+    """
+    columns = [col for col, _ in schema if col is not None and col != '' and not str(col).startswith('Unnamed')]
+    column_config = {'ت': st.column_config.NumberColumn('ت', format="%d", width="small")}
+    for col, dtype in schema:
+        if col in columns and dtype.startswith('datetime64'):
+            column_config[col] = st.column_config.DateColumn(col, format="YYYY-MM-DD")
+    return {'columns': columns, 'column_config': column_config}
+
+
+@instrument()
+def format_display_page(df, start_idx, end_idx, plan):
+    """
+    Build the displayed rows of one page
+
+    Only the page slice is copied, so the cost grows with the page size and
+    not with the size of the dataset.
+
+    Args:
+        df: DataFrame containing employee data
+        start_idx: Position of the first row of the page
+        end_idx: Position after the last row of the page
+        plan: Result of _display_format_plan
+
+    Returns:
+        DataFrame: Page rows with the sequence column "ت" first
+    """
+    page = df.iloc[start_idx:end_idx][plan['columns']].reset_index(drop=True)
+    # عمود التسلسل "ت" في أقصى اليمين، مرقم حسب موقع الصف في الجدول كله
+    page.insert(0, 'ت', range(start_idx + 1, end_idx + 1))
+    return page
+
+
+@instrument()
+def display_data_table(df, columns_mapping, version=None, filters_key=None, key="data_table"):
     """
     Display employee data in a paginated table
 
     Args:
         df: DataFrame containing employee data
         columns_mapping: Dictionary mapping internal column names to display names
+        version: Optional dataset version of the unfiltered data; together with
+            filters_key it identifies df without hashing it on every rerun
+        filters_key: Signature of the filters that produced df from that data
+        key: Prefix of the widget keys and of the page state
+            (st.session_state[f"{key}_page"]), so several tables can be shown
+            in one run
     """
     if df is None or df.empty:
         st.warning("لا توجد بيانات للعرض")
         return
 
-    # Create a copy of the dataframe for display
-    display_df = df.copy()
+    # مفتاح ذاكرة التصدير: نسخة البيانات وتوقيع التصفية، أو بصمة الجدول نفسه
+    table_key = (version, filters_key) if version else (dataset_version(df),)
+
+    _paginated_table(df, table_key, key)
+
 
-    # Format date columns for better display
-    for col in display_df.columns:
-        if pd.api.types.is_datetime64_any_dtype(display_df[col]):
-            display_df[col] = display_df[col].dt.strftime('%Y-%m-%d')
+def _set_current_page(page_state, page):
+    st.session_state[page_state] = page
 
-    # إزالة أي عمود تسلسلي قد يكون موجوداً بالفعل (ربما عمود مؤشر)
-    if display_df.index.name is None and isinstance(display_df.index, pd.RangeIndex):
-        # إعادة تعيين المؤشر
-        display_df = display_df.reset_index(drop=True)
 
-    # تأكد من حذف أي أعمدة بلا اسم
-    for col in display_df.columns:
-        if col == '' or col is None:
-            display_df = display_df.drop(col, axis=1)
+def _jump_to_page(page_state, jump_key):
+    st.session_state[page_state] = st.session_state[jump_key]
 
-    # إضافة عمود التسلسل "ت" في أقصى اليمين
-    display_df.insert(0, 'ت', range(1, len(display_df) + 1))
 
-    # تأكد من أنه لا يوجد صف بمؤشر يبدأ من 0
-    display_df = display_df.copy()
+@st.fragment
+def _paginated_table(df, table_key, key):
+    """
+    Pagination controls, current page and export buttons of display_data_table
+
+    Runs as a fragment: changing the page or the page size reruns this region
+    only, not the whole app.
+
+    Args:
+        df: DataFrame containing employee data
+        table_key: Cache key of df for the page exports
+        key: Widget key prefix (see display_data_table)
+    """
+    plan = _display_format_plan(_schema_signature(df))
 
     # Pagination controls in a nice card
     st.markdown("""
@@ -55,44 +193,50 @@ def display_data_table(df, columns_mapping):
     col1, col2 = st.columns([1, 3])
 
     with col1:
-        rows_per_page = st.number_input("عدد الصفوف في الصفحة", min_value=10, max_value=100, value=25, step=5)
+        rows_per_page = st.number_input(
+            "عدد الصفوف في الصفحة", min_value=10, max_value=100, value=25, step=5, key=f"{key}_rows_per_page"
+        )
 
-    total_pages = (len(display_df) - 1) // rows_per_page + 1
+    total_pages = (len(df) - 1) // rows_per_page + 1
 
-    if 'current_page' not in st.session_state:
-        st.session_state.current_page = 1
+    page_state, jump_key = f"{key}_page", f"{key}_page_jump"
+    # A smaller result or a larger page size can leave the current page out of range
+    current_page = min(st.session_state.get(page_state, 1), total_pages)
+    st.session_state[page_state] = current_page
 
-    # Page navigation
+    # Page navigation: the page changes in widget callbacks, before this region
+    # is rendered again, so no extra rerun is needed
+    st.session_state[jump_key] = current_page
     col1, col2, col3, col4 = st.columns([1, 1, 2, 1])
 
     with col1:
-        if st.button("الصفحة السابقة", use_container_width=True):
-            if st.session_state.current_page > 1:
-                st.session_state.current_page -= 1
-                st.rerun()
+        st.button(
+            "الصفحة السابقة", use_container_width=True, key=f"{key}_previous_page",
+            on_click=_set_current_page, args=(page_state, max(current_page - 1, 1))
+        )
 
     with col2:
-        if st.button("الصفحة التالية", use_container_width=True):
-            if st.session_state.current_page < total_pages:
-                st.session_state.current_page += 1
-                st.rerun()
+        st.button(
+            "الصفحة التالية", use_container_width=True, key=f"{key}_next_page",
+            on_click=_set_current_page, args=(page_state, min(current_page + 1, total_pages))
+        )
 
     with col3:
         st.markdown(f"""
         <div style="text-align: center; padding: 8px; background-color: #e9ecef; border-radius: 5px;">
-            <p style="margin-bottom: 0; font-weight: bold;">الصفحة {st.session_state.current_page} من {total_pages}</p>
+            <p style="margin-bottom: 0; font-weight: bold;">الصفحة {current_page} من {total_pages}</p>
         </div>
         """, unsafe_allow_html=True)
 
     with col4:
-        page_number = st.number_input("انتقال إلى صفحة", min_value=1, max_value=total_pages, value=st.session_state.current_page)
-        if page_number != st.session_state.current_page:
-            st.session_state.current_page = page_number
-            st.rerun()
+        st.number_input(
+            "انتقال إلى صفحة", min_value=1, max_value=total_pages,
+            key=jump_key, on_change=_jump_to_page, args=(page_state, jump_key)
+        )
 
     # Display current page of data
-    start_idx = (st.session_state.current_page - 1) * rows_per_page
-    end_idx = min(start_idx + rows_per_page, len(display_df))
+    start_idx = (current_page - 1) * rows_per_page
+    end_idx = min(start_idx + rows_per_page, len(df))
 
     # Apply styling to the dataframe
     st.markdown("""
@@ -110,28 +254,49 @@ def display_data_table(df, columns_mapping):
     st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
     # Display table with current page data with improved styling
     st.dataframe(
-        display_df.iloc[start_idx:end_idx], 
+        format_display_page(df, start_idx, end_idx, plan),
         use_container_width=True,
         height=min(35 * rows_per_page, 500),  # Dynamic height based on rows
+        column_config=plan['column_config'],
+        hide_index=True,
     )
-    # أزرار التصدير السريع
+    # أزرار التصدير السريع: تُبنى الصفحة عند النقر فقط وتُحفظ حسب (البيانات، التصفية، الصفحة، حجم الصفحة)
+    page_key = table_key + (current_page, rows_per_page)
+    page_df = df.iloc[start_idx:end_idx]
     col1, col2, col3 = st.columns(3)
     with col1:
-        csv_data = convert_df_to_csv(display_df.iloc[start_idx:end_idx])
         st.download_button(
             "تصدير الصفحة الحالية (CSV)",
-            csv_data,
-            f"employee_data_page_{st.session_state.current_page}.csv",
-            "text/csv"
+            deferred_export(page_df, 'csv', version=page_key),
+            f"employee_data_page_{current_page}.csv",
+            "text/csv",
+            key=f"{key}_export_page_csv"
         )
 
     with col2:
-        excel_data = save_excel_file(display_df.iloc[start_idx:end_idx])
         st.download_button(
             "تصدير الصفحة الحالية (Excel)",
-            excel_data,
-            f"employee_data_page_{st.session_state.current_page}.xlsx",
-            "application/vnd.ms-excel"
+            deferred_export(page_df, 'xlsx', version=page_key),
+            f"employee_data_page_{current_page}.xlsx",
+            "application/vnd.ms-excel",
+            key=f"{key}_export_page_xlsx"
+        )
+
+    with col3:
+        # كل الصفحات تُكتب على دفعات من النتيجة المصفاة مباشرة دون تجميع الصفحات في الذاكرة
+        all_pages_format = st.selectbox(
+            "تصدير كل الصفحات",
+            ["CSV", "CSV (gzip)", "Excel"],
+            key=f"{key}_export_all_pages_format",
+            label_visibility="collapsed"
+        )
+        fmt = {"CSV": 'csv', "CSV (gzip)": 'csv.gz', "Excel": 'xlsx'}[all_pages_format]
+        st.download_button(
+            f"تصدير كل الصفحات ({all_pages_format})",
+            streamed_export(df, fmt),
+            f"employee_data_all_pages.{fmt}",
+            EXPORT_MIME_TYPES[fmt],
+            key=f"{key}_export_all_pages"
         )
 
     st.markdown('</div>', unsafe_allow_html=True)
@@ -139,10 +304,11 @@ def display_data_table(df, columns_mapping):
     # Display record count information in a better format
     st.markdown(f"""
     <div style="background-color: #e9ecef; padding: 10px; border-radius: 5px; text-align: center;">
-        <p style="margin-bottom: 0;">عرض السجلات <b>{start_idx + 1}</b> إلى <b>{end_idx}</b> من أصل <b>{len(display_df)}</b> سجل</p>
+        <p style="margin-bottom: 0;">عرض السجلات <b>{start_idx + 1}</b> إلى <b>{end_idx}</b> من أصل <b>{len(df)}</b> سجل</p>
     </div>
     """, unsafe_allow_html=True)
 
+@instrument()
 def create_search_filters(df, columns_mapping):
     """
     Create enhanced search and filter interface with advanced options
@@ -268,134 +434,230 @@ def create_search_filters(df, columns_mapping):
 
     return filters
 
-def create_export_section(df):
-    """Create enhanced data export interface with multiple format options"""
-    if df is None or df.empty:
-        st.warning("لا توجد بيانات للتصدير")
-        return
+#-------------------------------------
+# التقارير المخصصة
+#-------------------------------------
+# عدد صفوف معاينة التقرير المخصص في الصفحة الواحدة
+CUSTOM_REPORT_PAGE_SIZE = 50
+
+
+def _dataframe_custom_report(df):
+    """Custom report over the loaded DataFrame."""
+    # اختيار الأعمدة
+    available_columns = df.columns.tolist()
+    selected_columns = st.multiselect(
+        "اختر الأعمدة",
+        options=available_columns,
+        default=available_columns[:3]
+    )
 
-    st.markdown("### 📊 التقارير المتقدمة")
+    # اختيار التصفية
+    filter_column = st.selectbox("تصفية حسب", ["بدون تصفية"] + df.columns.tolist())
+    if filter_column != "بدون تصفية":
+        filter_values = st.multiselect(
+            "اختر القيم",
+            df[filter_column].unique().tolist()
+        )
 
-    report_tabs = st.tabs([
-        "تقارير تحليلية", 
-        "تقارير تفصيلية",
-        "تقارير مخصصة",
-        "تصدير البيانات"
-    ])
-
-    with report_tabs[0]:
-        analysis_type = st.selectbox(
-            "نوع التحليل",
-            [
-                "تحليل الموارد البشرية",
-                "تحليل المؤهلات والكفاءات",
-                "تحليل التوزيع الجغرافي",
-                "تحليل الهيكل التنظيمي"
-            ]
+        if filter_values:
+            filtered_df = df[df[filter_column].isin(filter_values)]
+        else:
+            filtered_df = df
+    else:
+        filtered_df = df
+
+    if selected_columns:
+        custom_report = filtered_df[selected_columns]
+        st.dataframe(custom_report)
+
+        st.download_button(
+            "تحميل التقرير (Excel)",
+            deferred_export(custom_report, 'xlsx'),
+            f"custom_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+            "application/vnd.ms-excel"
         )
 
-        if analysis_type == "تحليل الموارد البشرية":
-            hr_metrics = {
-                "إجمالي الموظفين": len(df),
-                "عدد الإدارات": df['الادارة'].nunique(),
-                "متوسط الموظفين لكل إدارة": len(df) / df['الادارة'].nunique()
-            }
-            st.write(pd.DataFrame([hr_metrics]).T)
 
-        elif analysis_type == "تحليل المؤهلات والكفاءات":
-            edu_analysis = pd.crosstab([df['المؤهل العلمي']], [df['فئة الوظيفة']], margins=True)
-            st.write(edu_analysis)
+def _database_custom_report():
+    """
+    Custom report compiled to SQL
+
+    Only the chosen columns and the matching rows are read from the database:
+    the preview is fetched one page at a time and the export streams the
+    result in chunks, so the full table is never loaded into the app.
+    """
+    mapping = st.session_state.get('columns_mapping', {})
+    scope = st.session_state.get('user_scope')
+
+    def column_label(col):
+        return mapping.get(col, col)
+
+    selected_columns = st.multiselect(
+        "اختر الأعمدة",
+        options=list(CUSTOM_REPORT_COLUMNS),
+        default=list(CUSTOM_REPORT_COLUMNS[:3]),
+        format_func=column_label,
+        key="db_report_columns"
+    )
 
-    with report_tabs[1]:
-        detailed_options = st.multiselect(
-            "اختر التفاصيل المطلوبة",
-            ["الادارة", "المؤهل العلمي", "فئة الوظيفة", "موقع العمل"],
-            default=["الادارة"]
+    filter_column = st.selectbox(
+        "تصفية حسب",
+        [None] + list(CUSTOM_REPORT_COLUMNS),
+        format_func=lambda col: "بدون تصفية" if col is None else column_label(col),
+        key="db_report_filter_column"
+    )
+    filter_values = []
+    if filter_column is not None:
+        filter_values = st.multiselect(
+            "اختر القيم",
+            get_distinct_values(filter_column, scope=scope),
+            key="db_report_filter_values"
         )
 
-        if detailed_options:
-            detailed_report = df.groupby(detailed_options).size().reset_index(name='العدد')
-            st.dataframe(detailed_report)
+    if not selected_columns:
+        return
 
-            if st.button("تصدير التقرير التفصيلي"):
-                excel_data = save_excel_file(detailed_report)
-                st.download_button(
-                    "تحميل التقرير (Excel)",
-                    excel_data,
-                    f"detailed_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                    "application/vnd.ms-excel"
-                )
+    total = count_custom_report(selected_columns, filter_column, filter_values, scope=scope)
+    total_pages = max((total - 1) // CUSTOM_REPORT_PAGE_SIZE + 1, 1)
+    page = st.number_input("الصفحة", min_value=1, max_value=total_pages, value=1, key="db_report_page")
 
-    with report_tabs[2]:
-        st.write("### إنشاء تقرير مخصص")
+    preview = get_custom_report_page(
+        selected_columns, filter_column, filter_values,
+        offset=(page - 1) * CUSTOM_REPORT_PAGE_SIZE, limit=CUSTOM_REPORT_PAGE_SIZE, scope=scope
+    )
+    st.dataframe(preview.rename(columns=mapping), hide_index=True)
+    st.caption(f"الصفحة {page} من {total_pages} — إجمالي {total} سجل")
 
-        # اختيار الأعمدة
-        available_columns = df.columns.tolist()
-        selected_columns = st.multiselect(
-            "اختر الأعمدة",
-            options=available_columns,
-            default=available_columns[:3]
+    def report_chunks():
+        return (
+            chunk.rename(columns=mapping)
+            for chunk in iter_custom_report(selected_columns, filter_column, filter_values, scope=scope)
         )
 
-        # اختيار التصفية
-        filter_column = st.selectbox("تصفية حسب", ["بدون تصفية"] + df.columns.tolist())
-        if filter_column != "بدون تصفية":
-            filter_values = st.multiselect(
-                "اختر القيم",
-                df[filter_column].unique().tolist()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "تحميل التقرير (Excel)",
+            streamed_export(report_chunks, 'xlsx'),
+            f"custom_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+            "application/vnd.ms-excel",
+            key="db_report_download_xlsx"
+        )
+    with col2:
+        st.download_button(
+            "تحميل التقرير (CSV)",
+            streamed_export(report_chunks, 'csv'),
+            f"custom_report_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+            "text/csv",
+            key="db_report_download_csv"
+        )
+
+
+@instrument()
+def create_export_section(df, version=None, filters_key=None):
+    """
+    Create enhanced data export interface with multiple format options
+
+    Args:
+        df: DataFrame containing employee data
+        version: Optional dataset version of the unfiltered data; together with
+            filters_key it identifies df without hashing it on every rerun
+        filters_key: Signature of the filters that produced df from that data
+    """
+    if df is None or df.empty:
+        st.warning("لا توجد بيانات للتصدير")
+        return
+
+    # مفتاح التقارير والتصدير: نسخة البيانات وتوقيع التصفية، أو بصمة الجدول نفسه
+    data_key = f"{version}-{filters_key}" if version else dataset_version(df)
+
+    st.markdown("### 📊 التقارير المتقدمة")
+
+    # Only the open tab's reports are computed
+    report_tabs = st.tabs([
+        "تقارير تحليلية", 
+        "تقارير تفصيلية",
+        "تقارير مخصصة",
+        "تصدير البيانات"
+    ], key="report_view", on_change="rerun")
+
+    if report_tabs[0].open:
+        with report_tabs[0]:
+            analysis_type = st.selectbox(
+                "نوع التحليل",
+                [
+                    "تحليل الموارد البشرية",
+                    "تحليل المؤهلات والكفاءات",
+                    "تحليل التوزيع الجغرافي",
+                    "تحليل الهيكل التنظيمي"
+                ]
             )
 
-            if filter_values:
-                filtered_df = df[df[filter_column].isin(filter_values)]
-            else:
-                filtered_df = df
-        else:
-            filtered_df = df
+            if analysis_type == "تحليل الموارد البشرية":
+                hr_metrics = {
+                    "إجمالي الموظفين": len(df),
+                    "عدد الإدارات": df['الادارة'].nunique(),
+                    "متوسط الموظفين لكل إدارة": len(df) / df['الادارة'].nunique()
+                }
+                st.write(pd.DataFrame([hr_metrics]).T)
+
+            elif analysis_type == "تحليل المؤهلات والكفاءات":
+                edu_analysis = pd.crosstab([df['المؤهل العلمي']], [df['فئة الوظيفة']], margins=True)
+                st.write(edu_analysis)
+
+    if report_tabs[1].open:
+        with report_tabs[1]:
+            detailed_options = st.multiselect(
+                "اختر التفاصيل المطلوبة",
+                ["الادارة", "المؤهل العلمي", "فئة الوظيفة", "موقع العمل"],
+                default=["الادارة"]
+            )
 
-        if selected_columns:
-            custom_report = filtered_df[selected_columns]
-            st.dataframe(custom_report)
+            if detailed_options:
+                detailed_report = df.groupby(detailed_options).size().reset_index(name='العدد')
+                st.dataframe(detailed_report)
 
-            if st.button("تصدير التقرير المخصص"):
-                excel_data = save_excel_file(custom_report)
                 st.download_button(
                     "تحميل التقرير (Excel)",
-                    excel_data,
-                    f"custom_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+                    deferred_export(detailed_report, 'xlsx'),
+                    f"detailed_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
                     "application/vnd.ms-excel"
                 )
 
-    with report_tabs[3]:
-        st.write("### تصدير البيانات")
-        export_format = st.radio(
-            "اختر صيغة التصدير",
-            ["Excel", "CSV", "JSON"],
-            horizontal=True
-        )
+    if report_tabs[2].open:
+        with report_tabs[2]:
+            st.write("### إنشاء تقرير مخصص")
 
-        if export_format == "Excel":
-            excel_data = save_excel_file(df)
-            st.download_button(
-                "تحميل الملف (Excel)",
-                excel_data,
-                f"data_export_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                "application/vnd.ms-excel"
-            )
-        elif export_format == "CSV":
-            csv_data = convert_df_to_csv(df)
-            st.download_button(
-                "تحميل الملف (CSV)",
-                csv_data,
-                f"data_export_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                "text/csv"
+            # عند العرض من قاعدة البيانات يُنفذ الإسقاط والتصفية في استعلام SQL
+            if st.session_state.get('data_source') == "قاعدة البيانات":
+                _database_custom_report()
+            else:
+                _dataframe_custom_report(df)
+
+    if report_tabs[3].open:
+        with report_tabs[3]:
+            st.write("### تصدير البيانات")
+            format_labels = {
+                "Excel": 'xlsx',
+                "CSV": 'csv',
+                "CSV (gzip)": 'csv.gz',
+                "JSON": 'json',
+                "Parquet": 'parquet',
+                "Arrow (Feather)": 'feather',
+            }
+            supported_formats = available_export_formats()
+            export_format = st.radio(
+                "اختر صيغة التصدير",
+                [label for label, fmt in format_labels.items() if fmt in supported_formats],
+                horizontal=True
             )
-        else:
-            json_data = df.to_json(orient='records', force_ascii=False)
+
+            fmt = format_labels[export_format]
             st.download_button(
-                "تحميل الملف (JSON)",
-                json_data,
-                f"data_export_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
-                "application/json"
+                f"تحميل الملف ({export_format})",
+                deferred_export(df, fmt),
+                f"data_export_{datetime.now().strftime('%Y%m%d_%H%M')}.{fmt}",
+                EXPORT_MIME_TYPES[fmt]
             )
 
     # تأكد من أن DataFrame يحتوي على البيانات المطلوبة
@@ -417,90 +679,43 @@ def create_export_section(df):
          "تقرير إحصائي شامل"]
     )
 
-    if report_type == "تقرير الموظفين حسب الإدارة":
-        dept_report = pd.pivot_table(
-            df,
-            index='الادارة',
-            values=['الرقم الوظيفي'],
-            aggfunc='count'
-        ).reset_index()
-        dept_report.columns = ['الإدارة', 'عدد الموظفين']
-        st.dataframe(dept_report)
-
-        # تصدير التقرير
-        if st.button("تصدير تقرير الإدارات"):
-            excel_data = save_excel_file(dept_report)
-            st.download_button(
-                "تحميل التقرير (Excel)",
-                excel_data,
-                f"dept_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                "application/vnd.ms-excel"
-            )
-
-    elif report_type == "تقرير المؤهلات العلمية":
-        edu_report = df.groupby(['المؤهل العلمي', 'الادارة']).size().unstack(fill_value=0)
-        st.dataframe(edu_report)
-
-        if st.button("تصدير تقرير المؤهلات"):
-            excel_data = save_excel_file(edu_report)
-            st.download_button(
-                "تحميل التقرير (Excel)",
-                excel_data,
-                f"education_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                "application/vnd.ms-excel"
-            )
-
-    elif report_type == "تقرير الفئات الوظيفية":
-        job_report = pd.crosstab([df['فئة الوظيفة']], df['الادارة'])
-        st.dataframe(job_report)
-
-        if st.button("تصدير تقرير الفئات الوظيفية"):
-            excel_data = save_excel_file(job_report)
-            st.download_button(
-                "تحميل التقرير (Excel)",
-                excel_data,
-                f"job_category_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                "application/vnd.ms-excel"
-            )
+    # كل التقارير تُشتق من تجميع واحد محفوظ لكل نسخة من البيانات
+    report_sheets = {
+        "تقرير الموظفين حسب الإدارة": ('dept_counts', 'dept_report'),
+        "تقرير المؤهلات العلمية": ('education_by_dept', 'education_report'),
+        "تقرير الفئات الوظيفية": ('category_by_dept', 'job_category_report'),
+        "تقرير التوزيع الجغرافي": ('location_by_dept_category', 'location_report'),
+    }
 
-    elif report_type == "تقرير التوزيع الجغرافي":
-        loc_report = pd.crosstab([df['موقع العمل']], [df['الادارة'], df['فئة الوظيفة']])
-        st.dataframe(loc_report)
+    if report_type in report_sheets:
+        report_key, file_prefix = report_sheets[report_type]
+        report = get_report_table(df, report_key, data_key)
+        st.dataframe(report)
 
-        if st.button("تصدير تقرير التوزيع الجغرافي"):
-            excel_data = save_excel_file(loc_report)
-            st.download_button(
-                "تحميل التقرير (Excel)",
-                excel_data,
-                f"location_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                "application/vnd.ms-excel"
-            )
+        # تصدير التقرير
+        st.download_button(
+            "تحميل التقرير (Excel)",
+            deferred_export(report, 'xlsx', index=bool(REPORT_SHEETS[report_key]['columns'])),
+            f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+            "application/vnd.ms-excel"
+        )
 
     elif report_type == "تقرير إحصائي شامل":
         # إنشاء تقرير إحصائي شامل
-        stats_dict = {
-            'إجمالي عدد الموظفين': len(df),
-            'عدد الإدارات': df['الادارة'].nunique(),
-            'عدد الفئات الوظيفية': df['فئة الوظيفة'].nunique(),
-            'عدد مواقع العمل': df['موقع العمل'].nunique()
-        }
-
-        stats_df = pd.DataFrame(list(stats_dict.items()), columns=['المؤشر', 'القيمة'])
-        st.dataframe(stats_df)
-
-        if st.button("تصدير التقرير الإحصائي"):
-            # إنشاء مصنف إكسل مع عدة أوراق عمل
-            with pd.ExcelWriter(BytesIO()) as writer:
-                stats_df.to_excel(writer, sheet_name='المؤشرات الرئيسية', index=False)
-                df.groupby('الادارة').size().reset_index(name='العدد').to_excel(writer, sheet_name='تفاصيل الإدارات', index=False)
-                df.groupby('فئة الوظيفة').size().reset_index(name='العدد').to_excel(writer, sheet_name='تفاصيل الفئات', index=False)
-
-                st.download_button(
-                    "تحميل التقرير الشامل (Excel)",
-                    writer.getvalue(),
-                    f"comprehensive_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                    "application/vnd.ms-excel"
-                )
+        st.dataframe(get_report_table(df, 'summary', data_key))
+
+        # يُبنى المصنف في عملية تصدير منفصلة دون حجب الجلسة
+        show_background_export(
+            ('comprehensive_report', data_key),
+            "تصدير التقرير الإحصائي",
+            lambda: submit_export(
+                ('comprehensive_report', data_key), build_report_workbook, df,
+                file_name=f"comprehensive_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+            ),
+            mime="application/vnd.ms-excel",
+            key="comprehensive_report",
+            on_done=_show_report_timings,
+        )
 
     st.markdown("### 📊 تصدير البيانات والتقارير")
 
@@ -512,13 +727,16 @@ def create_export_section(df):
     )
 
     if export_type == "تقرير كامل":
-        # تصدير كل البيانات
-        excel_data = save_excel_file(df)
-        st.download_button(
-            label="تحميل التقرير الكامل (Excel)",
-            data=excel_data,
-            file_name=f"full_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-            mime="application/vnd.ms-excel"
+        # تصدير كل البيانات في عملية منفصلة
+        show_background_export(
+            ('full_report', data_key),
+            "تجهيز التقرير الكامل (Excel)",
+            lambda: submit_export(
+                ('full_report', data_key), serialize_export, df, 'xlsx',
+                file_name=f"full_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+            ),
+            mime="application/vnd.ms-excel",
+            key="full_report",
         )
 
     elif export_type == "بيانات مختارة":
@@ -529,10 +747,9 @@ def create_export_section(df):
         )
         if selected_cols:
             filtered_df = df[selected_cols]
-            csv_data = convert_df_to_csv(filtered_df)
             st.download_button(
                 label="تحميل البيانات المختارة (CSV)",
-                data=csv_data,
+                data=deferred_export(filtered_df, 'csv'),
                 file_name=f"selected_data_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
                 mime="text/csv"
             )
@@ -540,10 +757,9 @@ def create_export_section(df):
     else:  # تقرير إحصائي
         # إنشاء تقرير إحصائي
         stats_df = df.describe()
-        excel_stats = save_excel_file(stats_df)
         st.download_button(
             label="تحميل التقرير الإحصائي (Excel)",
-            data=excel_stats,
+            data=deferred_export(stats_df, 'xlsx', index=True),
             file_name=f"statistical_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
             mime="application/vnd.ms-excel"
         )
@@ -594,21 +810,17 @@ def create_export_section(df):
 
     with col2:
         if export_format == "Excel":
-            excel_data = save_excel_file(df)
-
             st.download_button(
                 label="تصدير إلى Excel",
-                data=excel_data,
+                data=deferred_export(df, 'xlsx'),
                 file_name=f"employee_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                 mime="application/vnd.ms-excel",
                 use_container_width=True
             )
         else:  # CSV
-            csv_data = convert_df_to_csv(df)
-
             st.download_button(
                 label="تصدير إلى CSV",
-                data=csv_data,
+                data=deferred_export(df, 'csv'),
                 file_name=f"employee_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv",
                 use_container_width=True
@@ -644,6 +856,9 @@ def create_export_section(df):
             options=viz_options
         )
 
+        # plotly is imported on first use rather than at startup
+        import plotly.express as px
+
         if viz_type == "توزيع الإدارات" and 'الادارة' in df.columns:
             dept_counts = df['الادارة'].value_counts().reset_index()
             dept_counts.columns = ['الإدارة', 'العدد']
@@ -745,55 +960,3 @@ def create_export_section(df):
             st.plotly_chart(fig, use_container_width=True)
 
         st.markdown('</div>', unsafe_allow_html=True)
-
-def save_excel_file(df, sheet_name="بيانات الموظفين"):
-    """
-    Save DataFrame to Excel file with enhanced Arabic support
-
-    Args:
-        df: DataFrame to save
-        sheet_name: اسم ورقة العمل
-
-    Returns:
-        bytes: Excel file as bytes
-    """
-    output = io.BytesIO()
-
-    # Create Excel writer with Arabic support
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Write DataFrame
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
-
-        # Get workbook and worksheet
-        workbook = writer.book
-        worksheet = writer.sheets[sheet_name]
-
-        # Set RTL direction for the worksheet
-        worksheet.sheet_view.rightToLeft = True
-
-        # Auto-adjust column widths
-        for column in worksheet.columns:
-            max_length = 0
-            column = [cell for cell in column]
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
-
-        # Add header formatting
-        header_font = Font(bold=True, name='Calibri', size=12)
-        header_fill = PatternFill(start_color='E9ECF0', end_color='E9ECF0', fill_type='solid')
-
-        for cell in worksheet[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='right', vertical='center', wrap_text=True)
-
-    return output.getvalue()
-
-def convert_df_to_csv(df):
-    return df.to_csv(encoding='utf-8', index=False).encode('utf-8')
\ No newline at end of file
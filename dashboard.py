@@ -5,14 +5,17 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import calendar
-from utils import convert_df_to_csv
+from utils import deferred_export, dataset_metadata
+from profiling import instrument
 
-def create_interactive_dashboard(df):
+@instrument()
+def create_interactive_dashboard(df, metadata=None):
     """
     Create an interactive data visualization dashboard with enhanced analytics
 
     Args:
         df: DataFrame containing employee data
+        metadata: Optional utils.dataset_metadata of df for the KPI cards
     """
     # إضافة التبديل بين أنواع العرض
     viz_type = st.radio(
@@ -22,7 +25,7 @@ def create_interactive_dashboard(df):
     )
 
     if viz_type == "نظرة عامة":
-        create_kpi_summary(df)
+        create_kpi_summary(df, metadata)
         create_pie_charts(df)
         create_bar_charts(df)
 
@@ -155,7 +158,7 @@ def create_interactive_dashboard(df):
     st.markdown('<h2 class="dashboard-title">لوحة تحكم التحليلات البصرية</h2>', unsafe_allow_html=True)
 
     # Create KPI summary cards
-    create_kpi_summary(df)
+    create_kpi_summary(df, metadata)
 
     # Filter section
     st.markdown('<div class="filter-section">', unsafe_allow_html=True)
@@ -199,8 +202,12 @@ def create_interactive_dashboard(df):
     if "trends" in selected_charts:
         create_trend_analysis(df)
 
-def create_kpi_summary(df):
-    """Create a summary of key performance indicators"""
+@instrument()
+def create_kpi_summary(df, metadata=None):
+    """Create a summary of key performance indicators from the dataset metadata"""
+    if metadata is None:
+        metadata = dataset_metadata(df, 'file')
+    distinct = metadata['distinct']
     st.markdown('<div class="dashboard-container">', unsafe_allow_html=True)
     st.markdown('<h3 style="text-align: right;">المؤشرات الرئيسية</h3>', unsafe_allow_html=True)
 
@@ -214,11 +221,11 @@ def create_kpi_summary(df):
             <h1 style="color: #0e4c92; font-size: 2.5rem; margin-bottom: 0.5rem;">{}</h1>
             <p style="font-size: 1rem; color: #777;">إجمالي الموظفين</p>
         </div>
-        """.format(len(df)), unsafe_allow_html=True)
+        """.format(metadata['rows']), unsafe_allow_html=True)
 
     # Department count
     with col2:
-        dept_count = df['الادارة'].nunique() if 'الادارة' in df.columns else 0
+        dept_count = distinct['department'] or 0
         st.markdown("""
         <div style="text-align: center; padding: 1rem; background-color: #fff1e6; border-radius: 5px; height: 100%;">
             <h1 style="color: #d56a00; font-size: 2.5rem; margin-bottom: 0.5rem;">{}</h1>
@@ -228,7 +235,7 @@ def create_kpi_summary(df):
 
     # Job Category count
     with col3:
-        job_cat_count = df['فئة الوظيفة'].nunique() if 'فئة الوظيفة' in df.columns else 0
+        job_cat_count = distinct['job_category'] or 0
         st.markdown("""
         <div style="text-align: center; padding: 1rem; background-color: #e6ffe6; border-radius: 5px; height: 100%;">
             <h1 style="color: #0a8a0a; font-size: 2.5rem; margin-bottom: 0.5rem;">{}</h1>
@@ -238,7 +245,7 @@ def create_kpi_summary(df):
 
     # Workplace count
     with col4:
-        workplace_count = df['موقع العمل'].nunique() if 'موقع العمل' in df.columns else 0
+        workplace_count = distinct['workplace'] or 0
         st.markdown("""
         <div style="text-align: center; padding: 1rem; background-color: #f0e6ff; border-radius: 5px; height: 100%;">
             <h1 style="color: #6a0dad; font-size: 2.5rem; margin-bottom: 0.5rem;">{}</h1>
@@ -248,6 +255,7 @@ def create_kpi_summary(df):
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+@instrument()
 def create_pie_charts(df):
     """Create pie charts for categorical data"""
     st.markdown('<div class="dashboard-container">', unsafe_allow_html=True)
@@ -367,6 +375,7 @@ def create_pie_charts(df):
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+@instrument()
 def create_bar_charts(df):
     """Create bar charts for categorical data analysis"""
     st.markdown('<div class="dashboard-container">', unsafe_allow_html=True)
@@ -460,6 +469,7 @@ def create_bar_charts(df):
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+@instrument()
 def create_demographic_analysis(df):
     """Create demographic analysis visualizations"""
     st.markdown('<div class="dashboard-container">', unsafe_allow_html=True)
@@ -648,6 +658,7 @@ def create_demographic_analysis(df):
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+@instrument()
 def create_trend_analysis(df):
     """Create trend analysis visualizations"""
     st.markdown('<div class="dashboard-container">', unsafe_allow_html=True)
@@ -872,10 +883,9 @@ def create_trend_analysis(df):
         """, unsafe_allow_html=True)
 
     # Export data button
-    export_data = convert_df_to_csv(df)
     st.download_button(
         label="تصدير البيانات الكاملة",
-        data=export_data,
+        data=deferred_export(df, 'csv'),
         file_name=f"dashboard_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
         mime="text/csv",
     )
@@ -1,11 +1,13 @@
 import os
 import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, String, Date, Float, Text, MetaData, Table
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, Float, Text, MetaData, Table, func, select
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 import streamlit as st
 from datetime import datetime
 import logging
+from profiling import instrument
+from utils import METADATA_DIMENSIONS
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -26,6 +28,35 @@ if DATABASE_URL:
 else:
     logger.warning("DATABASE_URL environment variable not set. Database functionality will be disabled.")
 
+# Callbacks run after any successful write to the employees table
+_write_listeners = []
+# Writes made through this process; updated_at only has a date, so it does
+# not show edits made on the day the data was loaded
+_write_count = 0
+
+
+def register_write_listener(func):
+    """
+    Register a callable invoked after employees are added, updated, deleted or imported.
+    """
+    if func not in _write_listeners:
+        _write_listeners.append(func)
+
+
+def get_write_count():
+    """Number of employee writes made through this process so far."""
+    return _write_count
+
+
+def _notify_write():
+    global _write_count
+    _write_count += 1
+    for listener in _write_listeners:
+        try:
+            listener()
+        except Exception as e:
+            logger.error(f"Error in write listener: {str(e)}")
+
 # Create a base class for declarative models
 Base = declarative_base()
 
@@ -51,6 +82,29 @@ class Employee(Base):
         return f"<Employee(name='{self.name}', employee_id='{self.employee_id}')>"
 
 
+# Persisted notifications, refreshed incrementally from employee changes
+class Notification(Base):
+    __tablename__ = 'notifications'
+    
+    id = Column(Integer, primary_key=True)
+    employee_id = Column(String(50), nullable=False, index=True)
+    type = Column(String(100), nullable=False, index=True)
+    message = Column(Text, nullable=False)
+    priority = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"<Notification(type='{self.type}', employee_id='{self.employee_id}')>"
+
+
+# Single-row bookkeeping of the last notification evaluation
+class NotificationState(Base):
+    __tablename__ = 'notification_state'
+    
+    id = Column(Integer, primary_key=True)
+    last_evaluated_at = Column(DateTime, nullable=True)
+
+
 def init_db():
     """
     Initialize the database by creating all tables if they don't exist.
@@ -64,6 +118,7 @@ def init_db():
         return False
 
 
+@instrument()
 def import_excel_to_db(df, replace_existing=False):
     """
     Import data from a pandas DataFrame to the database.
@@ -131,6 +186,7 @@ def import_excel_to_db(df, replace_existing=False):
         
         # Commit the session
         session.commit()
+        _notify_write()
         
         message = f"Import completed: {imported_count} records imported, {updated_count} records updated, {error_count} errors."
         logger.info(message)
@@ -144,16 +200,85 @@ def import_excel_to_db(df, replace_existing=False):
         return False, error_message
 
 
-def get_all_employees():
+#-------------------------------------
+# نطاق صفوف المستخدم
+#-------------------------------------
+# أعمدة الموظفين التي يمكن تقييد المستخدم بها (نطاق إدارة أو تابعية)
+ROW_SCOPE_COLUMNS = ('department', 'affiliation')
+
+
+def row_scope_clause(scope):
+    """
+    Build the WHERE clause restricting employees to a user's scope.
+    
+    Args:
+        scope: (column, value) tuple with column in ROW_SCOPE_COLUMNS, or None
+        
+    Returns:
+        SQL expression, or None when the scope is unrestricted
+    """
+    if not scope:
+        return None
+    column, value = scope
+    if column not in ROW_SCOPE_COLUMNS:
+        raise ValueError(f"Unknown row scope column: {column}")
+    # القيم المستوردة من الإكسل قد تحتوي على مسافات زائدة
+    return func.trim(Employee.__table__.c[column]) == str(value).strip()
+
+
+def _find_employee(employee_id, scope=None):
+    """
+    Look up an employee, treating rows outside the scope as missing.
+    
+    Args:
+        employee_id: The employee_id to look up
+        scope: Optional (column, value) row scope of the current user
+        
+    Returns:
+        Employee or None
+    """
+    query = session.query(Employee).filter_by(employee_id=employee_id)
+    clause = row_scope_clause(scope)
+    if clause is not None:
+        query = query.filter(clause)
+    return query.first()
+
+
+def _outside_scope(data, scope):
+    """
+    Check whether written employee fields would move a row out of a scope.
+    
+    Args:
+        data: Dictionary of employee fields being written
+        scope: Optional (column, value) row scope of the current user
+        
+    Returns:
+        bool: True if the scope column is written with a foreign value
+    """
+    if not scope:
+        return False
+    column, value = scope
+    return column in data and str(data[column] or '').strip() != str(value).strip()
+
+
+@instrument()
+def get_all_employees(scope=None):
     """
     Get all employees from the database.
     
+    Args:
+        scope: Optional (column, value) row scope of the current user
+    
     Returns:
         DataFrame: pandas DataFrame containing all employees
     """
     try:
         # Query all employees
-        employees = session.query(Employee).all()
+        query = session.query(Employee)
+        clause = row_scope_clause(scope)
+        if clause is not None:
+            query = query.filter(clause)
+        employees = query.all()
         
         # Convert to list of dictionaries
         records = [
@@ -170,12 +295,49 @@ def get_all_employees():
         return pd.DataFrame()
 
 
-def search_employees(search_params):
+def get_employee_metadata(scope=None):
+    """
+    Dataset metadata of the employees table, computed in one aggregate query.
+
+    Args:
+        scope: Optional (column, value) row scope of the current user
+
+    Returns:
+        dict: Same keys as utils.dataset_metadata; 'modified_at' is the latest
+        update date of an employee
+    """
+    dimensions = list(METADATA_DIMENSIONS)
+    query = select(
+        func.count(Employee.id),
+        func.max(Employee.updated_at),
+        *[func.count(func.distinct(getattr(Employee, dimension))) for dimension in dimensions]
+    )
+    clause = row_scope_clause(scope)
+    if clause is not None:
+        query = query.where(clause)
+    try:
+        with engine.connect() as connection:
+            row = connection.execute(query).one()
+    except Exception as e:
+        logger.error(f"Error reading employee metadata: {str(e)}")
+        row = (0, None) + (None,) * len(dimensions)
+    return {
+        'rows': row[0],
+        'distinct': dict(zip(dimensions, row[2:])),
+        'source': 'database',
+        'source_path': None,
+        'modified_at': row[1],
+    }
+
+
+@instrument()
+def search_employees(search_params, scope=None):
     """
     Search employees based on provided parameters.
     
     Args:
         search_params: Dictionary of search parameters
+        scope: Optional (column, value) row scope of the current user
         
     Returns:
         DataFrame: pandas DataFrame containing search results
@@ -183,6 +345,9 @@ def search_employees(search_params):
     try:
         # Start with base query
         query = session.query(Employee)
+        clause = row_scope_clause(scope)
+        if clause is not None:
+            query = query.filter(clause)
         
         # Apply filters
         if search_params.get('name'):
@@ -218,6 +383,275 @@ def search_employees(search_params):
         return pd.DataFrame()
 
 
+def get_employees_updated_since(since):
+    """
+    Get employees created or updated on or after a date.
+    
+    Args:
+        since: date of the previous evaluation
+        
+    Returns:
+        DataFrame: pandas DataFrame containing the changed employees
+    """
+    try:
+        employees = session.query(Employee).filter(Employee.updated_at >= since).all()
+        
+        records = [
+            {c.name: getattr(employee, c.name) for c in Employee.__table__.columns}
+            for employee in employees
+        ]
+        return pd.DataFrame(records)
+    
+    except Exception as e:
+        logger.error(f"Error retrieving changed employees: {str(e)}")
+        return pd.DataFrame()
+
+
+def get_notifications_evaluated_at():
+    """
+    Get the time of the last notification evaluation.
+    
+    Returns:
+        datetime or None
+    """
+    try:
+        state = session.get(NotificationState, 1)
+        return state.last_evaluated_at if state else None
+    except Exception as e:
+        logger.error(f"Error retrieving notification state: {str(e)}")
+        return None
+
+
+def replace_notifications(employee_ids, notifications, evaluated_at, record_evaluation=True):
+    """
+    Replace the stored notifications of the given employees.
+    
+    Args:
+        employee_ids: employee_ids that were re-evaluated, or None to replace all notifications
+        notifications: list of dicts with keys employee_id, type, message, priority
+        evaluated_at: time of this evaluation
+        record_evaluation: Store evaluated_at as the time of the last evaluation
+            of all employees; False when only part of them was re-evaluated
+        
+    Returns:
+        tuple: (success, message)
+    """
+    try:
+        if employee_ids is None:
+            session.query(Notification).delete()
+        else:
+            employee_ids = list(employee_ids)
+            # Chunk the IN clause to stay below SQLite's bound-parameter limit
+            for i in range(0, len(employee_ids), 500):
+                session.query(Notification).filter(
+                    Notification.employee_id.in_(employee_ids[i:i + 500])
+                ).delete(synchronize_session=False)
+            
+            # Drop notifications of employees that no longer exist
+            session.query(Notification).filter(
+                ~Notification.employee_id.in_(session.query(Employee.employee_id))
+            ).delete(synchronize_session=False)
+        
+        if notifications:
+            session.execute(
+                Notification.__table__.insert(),
+                [dict(record, created_at=evaluated_at) for record in notifications]
+            )
+        
+        if record_evaluation:
+            state = session.get(NotificationState, 1)
+            if state is None:
+                state = NotificationState(id=1)
+                session.add(state)
+            state.last_evaluated_at = evaluated_at
+        
+        session.commit()
+        return True, f"{len(notifications)} notifications stored."
+    
+    except Exception as e:
+        session.rollback()
+        error_message = f"Error storing notifications: {str(e)}"
+        logger.error(error_message)
+        return False, error_message
+
+
+def _scoped_notifications(query, scope):
+    """Restrict a Notification query to the employees in a row scope."""
+    clause = row_scope_clause(scope)
+    if clause is None:
+        return query
+    return query.join(Employee, Employee.employee_id == Notification.employee_id).filter(clause)
+
+
+def get_notification_counts(scope=None):
+    """
+    Count stored notifications per type.
+    
+    Args:
+        scope: Optional (column, value) row scope of the current user
+    
+    Returns:
+        list: (type, priority, count) tuples ordered by type
+    """
+    try:
+        query = session.query(Notification.type, Notification.priority, func.count(Notification.id))
+        rows = _scoped_notifications(query, scope).group_by(
+            Notification.type, Notification.priority
+        ).order_by(Notification.type).all()
+        return [tuple(row) for row in rows]
+    except Exception as e:
+        logger.error(f"Error counting notifications: {str(e)}")
+        return []
+
+
+def get_notifications_page(notification_type, offset, limit, scope=None):
+    """
+    Get one page of stored notifications of a given type.
+    
+    Args:
+        notification_type: notification type to list
+        offset: number of notifications to skip
+        limit: page size
+        scope: Optional (column, value) row scope of the current user
+        
+    Returns:
+        list: notification dicts with keys 'نوع', 'رسالة' and 'أولوية'
+    """
+    try:
+        rows = _scoped_notifications(session.query(Notification), scope).filter(
+            Notification.type == notification_type
+        ).order_by(Notification.id).offset(offset).limit(limit).all()
+        return [
+            {'نوع': row.type, 'رسالة': row.message, 'أولوية': row.priority}
+            for row in rows
+        ]
+    except Exception as e:
+        logger.error(f"Error retrieving notifications: {str(e)}")
+        return []
+
+
+#-------------------------------------
+# التقارير المخصصة: الإسقاط والتصفية في قاعدة البيانات
+#-------------------------------------
+# أعمدة الموظفين المتاحة في التقارير المخصصة
+CUSTOM_REPORT_COLUMNS = (
+    'employee_id', 'name', 'national_id', 'birth_date', 'education', 'position',
+    'job_category', 'department', 'affiliation', 'workplace',
+)
+
+# عدد الصفوف المقروءة من قاعدة البيانات في كل دفعة عند التصدير
+REPORT_FETCH_SIZE = 5000
+
+
+def build_custom_report_query(columns, filter_column=None, filter_values=None, scope=None):
+    """
+    Compile a custom report to a SELECT of the chosen columns with a WHERE clause.
+    
+    Args:
+        columns: Employee column names to select (from CUSTOM_REPORT_COLUMNS)
+        filter_column: Optional column to filter on
+        filter_values: Values of filter_column to keep
+        scope: Optional (column, value) row scope of the current user
+        
+    Returns:
+        Select: SQLAlchemy statement ordered by the primary key
+    """
+    table = Employee.__table__
+    unknown = [col for col in list(columns) + [filter_column] if col and col not in CUSTOM_REPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown report columns: {unknown}")
+    
+    query = select(*[table.c[col] for col in columns])
+    if filter_column and filter_values:
+        query = query.where(table.c[filter_column].in_(list(filter_values)))
+    clause = row_scope_clause(scope)
+    if clause is not None:
+        query = query.where(clause)
+    return query.order_by(table.c.id)
+
+
+@instrument(rows=lambda total, args, kwargs: total)
+def count_custom_report(columns, filter_column=None, filter_values=None, scope=None):
+    """
+    Count the rows of a custom report without fetching them.
+    
+    Returns:
+        int: Number of matching employees
+    """
+    try:
+        query = build_custom_report_query(columns, filter_column, filter_values, scope).order_by(None)
+        return session.execute(select(func.count()).select_from(query.subquery())).scalar_one()
+    except Exception as e:
+        logger.error(f"Error counting custom report rows: {str(e)}")
+        return 0
+
+
+@instrument()
+def get_custom_report_page(columns, filter_column=None, filter_values=None, offset=0, limit=50, scope=None):
+    """
+    Get one page of a custom report (LIMIT/OFFSET in the database).
+    
+    Returns:
+        DataFrame: pandas DataFrame with the selected columns
+    """
+    try:
+        query = build_custom_report_query(columns, filter_column, filter_values, scope).offset(offset).limit(limit)
+        result = session.execute(query)
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
+    except Exception as e:
+        logger.error(f"Error retrieving custom report page: {str(e)}")
+        return pd.DataFrame(columns=list(columns))
+
+
+def iter_custom_report(columns, filter_column=None, filter_values=None, chunk_size=REPORT_FETCH_SIZE, scope=None):
+    """
+    Stream a custom report from the database in chunks.
+    
+    Rows are fetched with a streaming cursor, so the full result is never held
+    in memory; feed the chunks to utils.write_csv_stream or write_excel_stream.
+    
+    Yields:
+        DataFrame: Chunks of at most chunk_size rows with the selected columns;
+        a single empty chunk when no row matches, so the header is still written
+    """
+    query = build_custom_report_query(columns, filter_column, filter_values, scope)
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        keys = list(result.keys())
+        empty = True
+        for rows in result.partitions():
+            empty = False
+            yield pd.DataFrame(rows, columns=keys)
+        if empty:
+            yield pd.DataFrame(columns=keys)
+
+
+def get_distinct_values(column, scope=None):
+    """
+    Get the distinct non-empty values of an employee column.
+    
+    Args:
+        column: Column name from CUSTOM_REPORT_COLUMNS
+        scope: Optional (column, value) row scope of the current user
+        
+    Returns:
+        list: Sorted distinct values
+    """
+    if column not in CUSTOM_REPORT_COLUMNS:
+        raise ValueError(f"Unknown report column: {column}")
+    try:
+        table_column = Employee.__table__.c[column]
+        query = select(table_column).distinct().order_by(table_column)
+        clause = row_scope_clause(scope)
+        if clause is not None:
+            query = query.where(clause)
+        rows = session.execute(query).scalars().all()
+        return [value for value in rows if value not in (None, '')]
+    except Exception as e:
+        logger.error(f"Error retrieving distinct values of {column}: {str(e)}")
+        return []
+
+
 def get_departments():
     """
     Get list of all departments.
@@ -263,24 +697,26 @@ def get_workplaces():
         return []
 
 
-def delete_employee(employee_id):
+def delete_employee(employee_id, scope=None):
     """
     Delete an employee by employee_id.
     
     Args:
         employee_id: The employee_id to delete
+        scope: Optional (column, value) row scope of the current user
         
     Returns:
         tuple: (success, message)
     """
     try:
-        employee = session.query(Employee).filter_by(employee_id=employee_id).first()
+        employee = _find_employee(employee_id, scope)
         
         if not employee:
             return False, "الموظف غير موجود."
         
         session.delete(employee)
         session.commit()
+        _notify_write()
         
         return True, "تم حذف الموظف بنجاح."
     
@@ -291,23 +727,27 @@ def delete_employee(employee_id):
         return False, error_message
 
 
-def update_employee(employee_id, data):
+def update_employee(employee_id, data, scope=None):
     """
     Update an employee by employee_id.
     
     Args:
         employee_id: The employee_id to update
         data: Dictionary of fields to update
+        scope: Optional (column, value) row scope of the current user
         
     Returns:
         tuple: (success, message)
     """
     try:
-        employee = session.query(Employee).filter_by(employee_id=employee_id).first()
+        employee = _find_employee(employee_id, scope)
         
         if not employee:
             return False, "الموظف غير موجود."
         
+        if _outside_scope(data, scope):
+            return False, "لا يمكن نقل الموظف خارج نطاق صلاحياتك."
+        
         # Update fields
         for key, value in data.items():
             if hasattr(employee, key):
@@ -316,6 +756,7 @@ def update_employee(employee_id, data):
         employee.updated_at = datetime.now()
         
         session.commit()
+        _notify_write()
         
         return True, "تم تحديث بيانات الموظف بنجاح."
     
@@ -326,17 +767,21 @@ def update_employee(employee_id, data):
         return False, error_message
 
 
-def add_employee(data):
+def add_employee(data, scope=None):
     """
     Add a new employee.
     
     Args:
         data: Dictionary of employee data
+        scope: Optional (column, value) row scope of the current user
         
     Returns:
         tuple: (success, message)
     """
     try:
+        if scope and _outside_scope({scope[0]: data.get(scope[0])}, scope):
+            return False, "لا يمكن إضافة موظف خارج نطاق صلاحياتك."
+        
         # Check if employee already exists
         existing = session.query(Employee).filter_by(employee_id=data['employee_id']).first()
         
@@ -347,6 +792,7 @@ def add_employee(data):
         new_employee = Employee(**data)
         session.add(new_employee)
         session.commit()
+        _notify_write()
         
         return True, "تمت إضافة الموظف بنجاح."
     
@@ -356,9 +802,3 @@ def add_employee(data):
         logger.error(error_message)
         return False, error_message
 
-
-# Initialize the database when the module is imported
-if DATABASE_URL:
-    init_db()
-else:
-    logger.error("DATABASE_URL environment variable not set.")
\ No newline at end of file
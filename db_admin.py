@@ -3,12 +3,14 @@ import pandas as pd
 from database import (
     import_excel_to_db, get_all_employees, delete_employee,
     update_employee, add_employee, get_departments,
-    get_job_categories, get_workplaces
+    get_job_categories, get_workplaces, get_employee_metadata
 )
-from utils import load_excel_file
+from utils import load_data_file
 from components import display_data_table
+from auth import admin_required
 from datetime import datetime
 
+@admin_required
 def show_db_admin():
     """Display the database administration interface."""
     
@@ -44,16 +46,21 @@ def show_db_admin():
     st.markdown('<div class="admin-header"><h2>إدارة قاعدة البيانات</h2></div>', unsafe_allow_html=True)
     
     # Create tabs for admin functions
-    tab1, tab2, tab3 = st.tabs(["استيراد البيانات", "إدارة الموظفين", "إضافة موظف جديد"])
+    tab1, tab2, tab3 = st.tabs(
+        ["استيراد البيانات", "إدارة الموظفين", "إضافة موظف جديد"], key="db_admin_view", on_change="rerun"
+    )
     
-    with tab1:
-        show_import_section()
+    if tab1.open:
+        with tab1:
+            show_import_section()
     
-    with tab2:
-        show_employee_management()
+    if tab2.open:
+        with tab2:
+            show_employee_management()
     
-    with tab3:
-        show_add_employee_form()
+    if tab3.open:
+        with tab3:
+            show_add_employee_form()
 
 
 def show_import_section():
@@ -62,14 +69,18 @@ def show_import_section():
     st.markdown('<h3 class="admin-title">استيراد البيانات من ملف إكسل</h3>', unsafe_allow_html=True)
     
     # Upload file
-    uploaded_file = st.file_uploader("اختر ملف إكسل للاستيراد", type=['xlsx', 'xls'], key="admin_upload")
+    uploaded_file = st.file_uploader(
+        "اختر ملف بيانات للاستيراد (Excel أو Parquet أو Arrow)",
+        type=['xlsx', 'xls', 'parquet', 'feather', 'arrow'],
+        key="admin_upload"
+    )
     
     # Replace existing data option
     replace_existing = st.checkbox("استبدال البيانات الموجودة", value=False)
     
     if uploaded_file is not None:
         try:
-            df = load_excel_file(uploaded_file)
+            df = load_data_file(uploaded_file)
             
             if df is not None:
                 st.write("معاينة البيانات:")
@@ -93,21 +104,20 @@ def show_import_section():
     st.markdown('<div class="admin-section">', unsafe_allow_html=True)
     st.markdown('<h3 class="admin-title">إحصائيات قاعدة البيانات</h3>', unsafe_allow_html=True)
     
-    df = get_all_employees()
+    # عدادات من استعلام تجميعي واحد بدلاً من تحميل جدول الموظفين كاملاً
+    metadata = get_employee_metadata(scope=st.session_state.get('user_scope'))
     
-    if not df.empty:
+    if metadata['rows']:
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("عدد الموظفين", len(df))
+            st.metric("عدد الموظفين", metadata['rows'])
         
         with col2:
-            departments = df['department'].dropna().unique()
-            st.metric("عدد الإدارات", len(departments))
+            st.metric("عدد الإدارات", metadata['distinct']['department'])
         
         with col3:
-            workplaces = df['workplace'].dropna().unique()
-            st.metric("عدد مواقع العمل", len(workplaces))
+            st.metric("عدد مواقع العمل", metadata['distinct']['workplace'])
     else:
         st.info("لا توجد بيانات في قاعدة البيانات حالياً. قم باستيراد البيانات أولاً.")
     
@@ -120,7 +130,7 @@ def show_employee_management():
     st.markdown('<h3 class="admin-title">إدارة بيانات الموظفين</h3>', unsafe_allow_html=True)
     
     # Get all employees
-    df = get_all_employees()
+    df = get_all_employees(scope=st.session_state.get('user_scope'))
     
     if df.empty:
         st.info("لا توجد بيانات موظفين في قاعدة البيانات.")
@@ -173,7 +183,7 @@ def show_employee_management():
         }
         
         # Display the data table
-        display_data_table(df, columns_mapping)
+        display_data_table(df, columns_mapping, key="db_admin_table")
         
         # Employee selection for editing or deletion
         st.markdown('<h4 class="admin-title">تعديل أو حذف موظف</h4>', unsafe_allow_html=True)
@@ -206,7 +216,9 @@ def show_employee_management():
             
             with conf_col1:
                 if st.button("تأكيد الحذف"):
-                    success, message = delete_employee(st.session_state.delete_employee_id)
+                    success, message = delete_employee(
+                        st.session_state.delete_employee_id, scope=st.session_state.get('user_scope')
+                    )
                     
                     if success:
                         st.success(message)
@@ -305,7 +317,7 @@ def show_edit_employee_form(employee_id, df):
             }
             
             # Update employee
-            success, message = update_employee(employee_id, data)
+            success, message = update_employee(employee_id, data, scope=st.session_state.get('user_scope'))
             
             if success:
                 st.success(message)
@@ -386,7 +398,7 @@ def show_add_employee_form():
                 }
                 
                 # Add employee
-                success, message = add_employee(data)
+                success, message = add_employee(data, scope=st.session_state.get('user_scope'))
                 
                 if success:
                     st.success(message)
@@ -0,0 +1,33 @@
+"""
+Entry point of the export worker processes started by jobs.submit_export.
+
+Reads a pickled (func, path, args, kwargs, report_progress) job from stdin,
+runs it with jobs._run_export and writes a pickled (succeeded, details or
+exception) outcome to stdout.
+"""
+import sys
+import pickle
+
+
+def main():
+    outcome_stream = sys.stdout.buffer
+    # ما تطبعه وحدات التصدير يذهب إلى stderr حتى لا يختلط بالنتيجة
+    sys.stdout = sys.stderr
+
+    func, path, args, kwargs, report_progress = pickle.load(sys.stdin.buffer)
+    from jobs import _run_export
+    try:
+        outcome = (True, _run_export(func, path, args, kwargs, report_progress))
+    except Exception as e:
+        outcome = (False, e)
+
+    try:
+        data = pickle.dumps(outcome)
+    except Exception:
+        data = pickle.dumps((False, RuntimeError(str(outcome[1]))))
+    outcome_stream.write(data)
+    outcome_stream.flush()
+
+
+if __name__ == '__main__':
+    main()
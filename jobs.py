@@ -0,0 +1,281 @@
+import os
+import sys
+import uuid
+import pickle
+import shutil
+import subprocess
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_schedules = {}
+
+
+def schedule_daily(name, func, hour=2, minute=0):
+    """
+    Run func every day at hour:minute in a daemon timer thread.
+
+    Scheduling the same name again is a no-op, so callers can safely call this
+    on every script run.
+
+    Args:
+        name: Unique name of the scheduled task
+        func: Callable without arguments
+        hour: Hour of the day (local time)
+        minute: Minute of the hour
+    """
+    with _lock:
+        if name in _schedules:
+            return
+        _schedules[name] = None
+
+    def arm():
+        now = datetime.now()
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        timer = threading.Timer((next_run - now).total_seconds(), fire)
+        timer.daemon = True
+        timer.start()
+        with _lock:
+            _schedules[name] = timer
+
+    def fire():
+        try:
+            func()
+        except Exception as e:
+            logger.error(f"Scheduled task {name!r} failed: {str(e)}")
+        finally:
+            arm()
+
+    arm()
+
+
+#-------------------------------------
+# مهام التصدير في عمليات منفصلة
+#-------------------------------------
+# مجلد ملفات التصدير الجاهزة للتحميل
+EXPORT_DIR = '.exports'
+# مدة بقاء ملف التصدير قبل حذفه
+EXPORT_TTL_SECONDS = 60 * 60
+# عمليات التصدير المتزامنة؛ الباقي ينتظر دوره دون أن يزاحم خادم الواجهة
+MAX_EXPORT_PROCESSES = 2
+# أقصى عدد لمهام التصدير المنتظرة أو الجارية، وما زاد عنه يُرفض
+MAX_ACTIVE_EXPORTS = 8
+
+# سكربت العامل الذي تبدأ منه كل عملية تصدير
+EXPORT_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export_worker.py')
+
+_export_pool = None
+_exports = {}
+
+
+def _get_export_pool():
+    """Create the pool of threads that wait on the export processes (caller holds the lock)."""
+    global _export_pool
+    if _export_pool is None:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        _export_pool = ThreadPoolExecutor(max_workers=MAX_EXPORT_PROCESSES, thread_name_prefix='export')
+    return _export_pool
+
+
+def _run_export_process(func, path, args, kwargs, report_progress):
+    """
+    Run _run_export in a new worker process started from EXPORT_WORKER.
+
+    The worker is a plain script rather than a multiprocessing child: Streamlit
+    runs the app as the __main__ module and multiprocessing would re-run it in
+    every worker it starts.
+
+    Returns:
+        The details returned by the export function
+    """
+    result = subprocess.run(
+        [sys.executable, EXPORT_WORKER],
+        input=pickle.dumps((func, path, args, kwargs, report_progress)),
+        capture_output=True,
+    )
+    if result.returncode != 0 or not result.stdout:
+        stderr = result.stderr.decode('utf-8', errors='replace')[-2000:]
+        raise RuntimeError(f"Export worker exited with status {result.returncode}: {stderr}")
+
+    succeeded, value = pickle.loads(result.stdout)
+    if not succeeded:
+        raise value
+    return value
+
+
+def _write_export_progress(progress_path, fraction, message=None):
+    tmp_path = progress_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(f"{max(0.0, min(float(fraction), 1.0))}\n{message or ''}")
+    os.replace(tmp_path, progress_path)
+
+
+def _read_export_progress(progress_path):
+    try:
+        with open(progress_path, encoding='utf-8') as f:
+            fraction, _, message = f.read().partition('\n')
+        return float(fraction), message or None
+    except (OSError, ValueError):
+        return 0.0, None
+
+
+def _run_export(func, path, args, kwargs, report_progress):
+    """
+    Run an export function in a worker process and write its output to path.
+
+    The function may return bytes, a binary file object, or a tuple of either
+    and picklable details (e.g. timings) that are handed back to the caller.
+    """
+    if report_progress:
+        progress_path = path + '.progress'
+        kwargs = dict(kwargs, progress=lambda fraction, message=None: _write_export_progress(progress_path, fraction, message))
+
+    result = func(*args, **kwargs)
+    details = None
+    if isinstance(result, tuple):
+        result, details = result
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        if isinstance(result, (bytes, bytearray)):
+            out.write(result)
+        else:
+            with result:
+                shutil.copyfileobj(result, out)
+    os.replace(tmp_path, path)
+    if report_progress and os.path.exists(progress_path):
+        os.remove(progress_path)
+    return details
+
+
+def _remove_export_files(path):
+    for file_path in (path, path + '.tmp', path + '.progress', path + '.progress.tmp'):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def cleanup_exports(ttl=EXPORT_TTL_SECONDS):
+    """
+    Delete finished exports older than ttl seconds.
+
+    Files left in EXPORT_DIR by earlier server processes are removed by age too.
+    """
+    now = time.time()
+    with _lock:
+        expired = [
+            key for key, export in _exports.items()
+            if export['future'].done() and now - export['submitted_at'] > ttl
+        ]
+        known_paths = {export['path'] for export in _exports.values()}
+        for key in expired:
+            known_paths.discard(_exports[key]['path'])
+            _remove_export_files(_exports.pop(key)['path'])
+
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    for name in os.listdir(EXPORT_DIR):
+        file_path = os.path.join(EXPORT_DIR, name)
+        if any(file_path.startswith(path) for path in known_paths):
+            continue
+        try:
+            if now - os.path.getmtime(file_path) > ttl:
+                os.remove(file_path)
+        except OSError:
+            pass
+
+
+def submit_export(job_key, func, *args, file_name, report_progress=False, **kwargs):
+    """
+    Submit an export to run in a separate process.
+
+    At most MAX_EXPORT_PROCESSES exports run at once and the rest wait their
+    turn. The output is written to EXPORT_DIR, where it is kept for
+    EXPORT_TTL_SECONDS. Submitting a key that is queued, running or finished
+    successfully returns the existing export, so the file doubles as a cache.
+
+    Args:
+        job_key: Hashable identifier of the export
+        func: Picklable (module-level) function returning bytes, a binary file
+            object, or a (data, details) tuple
+        file_name: File name offered for download
+        report_progress: Pass a progress(fraction, message) callback to func
+
+    Returns:
+        The job key, or None when MAX_ACTIVE_EXPORTS exports are already
+        queued or running
+    """
+    cleanup_exports()
+
+    with _lock:
+        existing = _exports.get(job_key)
+        if existing is not None:
+            future = existing['future']
+            if not future.done() or (future.exception() is None and os.path.exists(existing['path'])):
+                return job_key
+            _remove_export_files(existing['path'])
+
+        active = sum(1 for export in _exports.values() if not export['future'].done())
+        if active >= MAX_ACTIVE_EXPORTS:
+            logger.warning(f"Export {job_key!r} rejected: {active} exports already active.")
+            return None
+
+        path = os.path.join(EXPORT_DIR, uuid.uuid4().hex)
+        future = _get_export_pool().submit(_run_export_process, func, path, args, kwargs, report_progress)
+        future.add_done_callback(lambda f: f.exception() and logger.error(f"Export {job_key!r} failed: {f.exception()}"))
+        _exports[job_key] = {
+            'future': future,
+            'path': path,
+            'file_name': file_name,
+            'submitted_at': time.time(),
+        }
+    return job_key
+
+
+def get_export(job_key):
+    """
+    Get the state of an export.
+
+    Returns:
+        dict or None: status (pending/running/done/failed), progress, message,
+        path and file_name of the output, details returned by the export
+        function and error; None if the export is unknown or has expired
+    """
+    with _lock:
+        export = _exports.get(job_key)
+    if export is None:
+        return None
+
+    future = export['future']
+    state = {
+        'status': 'pending',
+        'progress': 0.0,
+        'message': None,
+        'path': export['path'],
+        'file_name': export['file_name'],
+        'details': None,
+        'error': None,
+    }
+
+    if not future.done():
+        if future.running():
+            state['status'] = 'running'
+            state['progress'], state['message'] = _read_export_progress(export['path'] + '.progress')
+        return state
+
+    error = future.exception()
+    if error is not None:
+        state.update(status='failed', error=str(error))
+    elif not os.path.exists(export['path']):
+        return None
+    else:
+        state.update(status='done', progress=1.0, details=future.result())
+    return state
@@ -1,47 +1,255 @@
-
 import streamlit as st
 from datetime import datetime, timedelta
 import pandas as pd
+import numpy as np
+import time
+import logging
+from database import (
+    get_all_employees, get_employees_updated_since, get_notifications_evaluated_at,
+    replace_notifications, get_notification_counts, get_notifications_page, get_write_count
+)
+from utils import dataset_version
+from profiling import instrument
+from retirement import (
+    RETIREMENT_ALERT_AGE, get_retirement_index, get_database_retirement_index,
+    employees_reaching_age, retiring_within_months, turning_age_this_quarter
+)
+
+logger = logging.getLogger(__name__)
+
+#-------------------------------------
+# محرك قواعد التنبيهات
+#-------------------------------------
+# كل قاعدة دالة تستقبل البيانات كاملة وتعيد قناعاً منطقياً للصفوف المطابقة،
+# ودالة رسائل لا تُستدعى إلا على الصفوف المطابقة فقط
+NOTIFICATION_RULES = []
+
+REQUIRED_FIELDS = {
+    'name': 'الاسم',
+    'employee_id': 'الرقم الوظيفي',
+    'department': 'الادارة',
+    'position': 'الوظيفة'
+}
+
+
+def notification_rule(rule_type, priority):
+    """
+    Register a vectorised notification rule.
+
+    The decorated function receives the full DataFrame and its dataset version
+    (None when unknown) and returns a tuple (mask, build_messages): a boolean Series marking flagged rows, and a callable
+    that takes the flagged rows and returns a Series of messages.
+
+    Args:
+        rule_type: Notification type shown to the user
+        priority: Notification priority ('عالية' or 'متوسطة')
+    """
+    def decorator(func):
+        NOTIFICATION_RULES.append({'نوع': rule_type, 'أولوية': priority, 'name': func.__name__, 'func': func})
+        return func
+    return decorator
+
+
+def _column_or_default(df, column, default):
+    """Return a column as strings, or a constant Series when it is missing."""
+    if column in df.columns:
+        return df[column].astype(object).where(df[column].notna(), default).astype(str)
+    return pd.Series(default, index=df.index)
+
+
+@notification_rule('بيانات ناقصة', 'عالية')
+def missing_required_fields(df, version=None):
+    """الموظفون الذين تنقصهم بيانات أساسية"""
+    missing = pd.DataFrame(
+        {field: df[field].isna() if field in df.columns else True for field in REQUIRED_FIELDS},
+        index=df.index
+    )
+    mask = missing.any(axis=1)
+
+    def build_messages(flagged):
+        flagged_missing = missing.loc[flagged.index]
+        missing_text = pd.Series('', index=flagged.index)
+        for field, label in REQUIRED_FIELDS.items():
+            missing_text = missing_text + np.where(flagged_missing[field], label + ', ', '')
+        missing_text = missing_text.str[:-2]
+
+        emp_name = _column_or_default(flagged, 'name', 'غير معروف')
+        emp_id = _column_or_default(flagged, 'employee_id', 'غير معروف')
+        return 'الموظف ' + emp_name + ' - ' + emp_id + ' يحتاج لاستكمال: ' + missing_text
+
+    return mask, build_messages
+
+
+@notification_rule('تنبيه سن التقاعد', 'متوسطة')
+def retirement_age(df, version=None):
+    """الموظفون الذين بلغوا أو سيبلغون سن التقاعد"""
+    if 'birth_date' not in df.columns:
+        return pd.Series(False, index=df.index), None
 
-def check_notifications(df):
-    """فحص وعرض التنبيهات"""
+    # بحث ثنائي في فهرس تواريخ الميلاد المرتب بدلاً من حساب عمر كل موظف
+    index = get_retirement_index(df, version=version)
+    flagged = employees_reaching_age(index, RETIREMENT_ALERT_AGE, end=datetime.now())
+    mask = pd.Series(df.index.isin(flagged), index=df.index)
+
+    def build_messages(flagged):
+        emp_name = _column_or_default(flagged, 'name', 'غير معروف')
+        return 'الموظف ' + emp_name + ' سيبلغ/بلغ سن التقاعد'
+
+    return mask, build_messages
+
+
+@instrument()
+def check_notifications(df, timings=None, version=None):
+    """فحص وعرض التنبيهات
+
+    Args:
+        df: DataFrame containing employee data
+        timings: Optional dict filled with the elapsed seconds of each rule
+        version: Optional precomputed dataset_version(df)
+
+    Returns:
+        list: Notification dicts with keys 'نوع', 'رسالة', 'أولوية' and 'employee_id'
+    """
     notifications = []
-    
-    # التحقق من المعلومات العامة للموظفين
-    for _, employee in df.iterrows():
-        # التحقق من اكتمال البيانات الأساسية
-        required_fields = ['name', 'employee_id', 'department', 'position']
-        column_mapping = {
-            'name': 'الاسم',
-            'employee_id': 'الرقم الوظيفي',
-            'department': 'الادارة',
-            'position': 'الوظيفة'
-        }
-        
-        missing_fields = [column_mapping[field] for field in required_fields if pd.isna(employee.get(field, None))]
-        
-        if missing_fields:
-            emp_name = employee.get('name', 'غير معروف')
-            emp_id = employee.get('employee_id', 'غير معروف')
-            notifications.append({
-                'نوع': 'بيانات ناقصة',
-                'رسالة': f"الموظف {emp_name} - {emp_id} يحتاج لاستكمال: {', '.join(missing_fields)}",
-                'أولوية': 'عالية'
-            })
-        
-        # التحقق من العمر إذا كان تاريخ الميلاد متوفر
-        if 'birth_date' in df.columns and pd.notna(employee['birth_date']):
-            birth_date = pd.to_datetime(employee['birth_date'])
-            age = (datetime.now() - birth_date).days / 365.25
-            if age >= 60:
-                notifications.append({
-                    'نوع': 'تنبيه سن التقاعد',
-                    'رسالة': f"الموظف {employee.get('name', 'غير معروف')} سيبلغ/بلغ سن التقاعد",
-                    'أولوية': 'متوسطة'
-                })
+
+    for rule in NOTIFICATION_RULES:
+        start = time.perf_counter()
+        mask, build_messages = rule['func'](df, version=version)
+        mask = mask.fillna(False).astype(bool)
+
+        if mask.any():
+            flagged = df[mask]
+            messages = build_messages(flagged)
+            employee_ids = _column_or_default(flagged, 'employee_id', '')
+            notifications.extend(
+                {'نوع': rule['نوع'], 'رسالة': message, 'أولوية': rule['أولوية'], 'employee_id': employee_id}
+                for message, employee_id in zip(messages, employee_ids)
+            )
+
+        elapsed = time.perf_counter() - start
+        if timings is not None:
+            timings[rule['name']] = elapsed
+        logger.debug(f"Notification rule {rule['name']}: {int(mask.sum())} rows flagged in {elapsed:.4f}s")
 
     return notifications
 
+@instrument()
+def refresh_notifications(full=False, scope=None):
+    """
+    Re-evaluate stored notifications for employees changed since the last run.
+
+    A full evaluation runs on the first call of each day (ages advance even
+    without edits) or when full=True; otherwise only employees whose
+    updated_at is on or after the previous evaluation are re-checked.
+
+    With a row scope, all employees of the scope are re-checked and the time
+    of the last evaluation is left alone, since the rest were not.
+
+    Args:
+        full: Re-evaluate every employee
+        scope: Optional (column, value) row scope of the current user
+
+    Returns:
+        tuple: (success, message)
+    """
+    now = datetime.now()
+
+    if scope is not None:
+        df = get_all_employees(scope=scope)
+        employee_ids = df['employee_id'].tolist() if not df.empty else []
+    else:
+        last_evaluated_at = get_notifications_evaluated_at()
+        if full or last_evaluated_at is None or last_evaluated_at.date() < now.date():
+            df = get_all_employees()
+            employee_ids = None
+        else:
+            df = get_employees_updated_since(last_evaluated_at.date())
+            employee_ids = df['employee_id'].tolist() if not df.empty else []
+
+    notifications = check_notifications(df) if not df.empty else []
+    records = [
+        {'employee_id': n['employee_id'], 'type': n['نوع'], 'message': n['رسالة'], 'priority': n['أولوية']}
+        for n in notifications
+    ]
+    return replace_notifications(employee_ids, records, now, record_evaluation=scope is None)
+
+
+# عدد عمليات الكتابة على الموظفين عند آخر تحديث للتنبيهات المحفوظة من هذه العملية
+_refreshed_at_write_count = None
+
+
+def _refresh_stale_notifications():
+    """تحديث التنبيهات المحفوظة إذا كان آخر تقييم قبل اليوم أو عُدّل موظفون بعده"""
+    global _refreshed_at_write_count
+    write_count = get_write_count()
+    evaluated_at = get_notifications_evaluated_at()
+    if (evaluated_at is None or evaluated_at.date() < datetime.now().date()
+            or write_count != _refreshed_at_write_count):
+        success, _ = refresh_notifications()
+        if success:
+            _refreshed_at_write_count = write_count
+
+
+def _english_columns(df):
+    """تسمية أعمدة الملف المحمل بأسماء أعمدة قاعدة البيانات التي تستخدمها القواعد"""
+    reverse_mapping = st.session_state.get('reverse_mapping', {})
+    # عناوين الملف قد تحتوي على مسافات زائدة أو تطويل (مثل "الاســــم")
+    return df.rename(columns=lambda column: reverse_mapping.get(str(column).replace('ـ', '').strip(), column))
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _session_notifications(version, _df):
+    """تنبيهات البيانات المحملة في الجلسة، محسوبة مرة واحدة لكل نسخة من البيانات"""
+    return check_notifications(_english_columns(_df), version=version)
+
+
+NOTIFICATIONS_PAGE_SIZE = 20
+
+
+def _render_notification_cards(notifications):
+    """عرض صفحة من التنبيهات في عنصر واحد بدلاً من عنصر لكل تنبيه"""
+    cards = []
+    for notif in notifications:
+        urgency_class = "notification-high" if notif['أولوية'] == 'عالية' else "notification-medium"
+        cards.append(f"""
+        <div class="notification-card {urgency_class}">
+            <div class="notification-title">{notif['نوع']}</div>
+            <p>{notif['رسالة']}</p>
+            <small>الأولوية: {notif['أولوية']}</small>
+        </div>
+        """)
+    st.markdown("".join(cards), unsafe_allow_html=True)
+
+
+def display_retirement_horizon(use_database):
+    """عرض الموظفين المقبلين على التقاعد من فهرس تواريخ الميلاد المحسوب مسبقاً"""
+    if use_database:
+        index = get_database_retirement_index(scope=st.session_state.get('user_scope'))
+        df = None
+    else:
+        df = st.session_state.df
+        index = get_retirement_index(df, version=st.session_state.get('df_version'))
+    
+    st.markdown("#### ⏳ آفاق التقاعد")
+    months = st.number_input("خلال الأشهر القادمة", min_value=1, max_value=120, value=12, key="retirement_horizon_months")
+    
+    retiring = retiring_within_months(index, months)
+    turning_alert_age = turning_age_this_quarter(index, RETIREMENT_ALERT_AGE)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric(f"يبلغون سن التقاعد خلال {months} شهراً", len(retiring))
+    with col2:
+        st.metric(f"يبلغون {RETIREMENT_ALERT_AGE} سنة هذا الربع", len(turning_alert_age))
+    
+    if len(retiring):
+        if use_database:
+            st.dataframe(pd.DataFrame({'الرقم الوظيفي': index['employee_ids'][retiring]}), hide_index=True)
+        else:
+            st.dataframe(df.loc[retiring], hide_index=True)
+
+
+@instrument()
 def display_notifications():
     """عرض واجهة التنبيهات"""
     st.markdown("""
@@ -70,22 +278,53 @@ def display_notifications():
     
     st.markdown("### 📋 التنبيهات والإشعارات")
     
-    if 'df' in st.session_state and not st.session_state.df.empty:
-        notifications = check_notifications(st.session_state.df)
+    # التنبيهات من مصدر البيانات المختار في الشريط الجانبي
+    use_database = st.session_state.get('data_source') == "قاعدة البيانات"
+    
+    if use_database:
+        # التنبيهات المحفوظة في قاعدة البيانات، تُحدَّث للموظفين المعدلين فقط
+        # ولا يُعرض منها إلا ما يخص موظفي نطاق المستخدم
+        scope = st.session_state.get('user_scope')
+        if st.button("تحديث التنبيهات", key="refresh_notifications"):
+            success, message = refresh_notifications(scope=scope)
+            if not success:
+                st.error(message)
+        _refresh_stale_notifications()
         
-        if notifications:
-            for notif in notifications:
-                urgency_class = "notification-high" if notif['أولوية'] == 'عالية' else "notification-medium"
-                
-                st.markdown(f"""
-                <div class="notification-card {urgency_class}">
-                    <div class="notification-title">{notif['نوع']}</div>
-                    <p>{notif['رسالة']}</p>
-                    <small>الأولوية: {notif['أولوية']}</small>
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            st.info("🎉 لا توجد تنبيهات حالياً - جميع البيانات مكتملة")
+        counts = {}
+        for notif_type, priority, count in get_notification_counts(scope=scope):
+            counts[notif_type] = counts.get(notif_type, 0) + count
+        get_page = lambda notif_type, offset: get_notifications_page(notif_type, offset, NOTIFICATIONS_PAGE_SIZE, scope=scope)
+    elif st.session_state.get('df') is not None and not st.session_state.df.empty:
+        df = st.session_state.df
+        notifications = _session_notifications(st.session_state.get('df_version') or dataset_version(df), df)
+        
+        by_type = {}
+        for notif in notifications:
+            by_type.setdefault(notif['نوع'], []).append(notif)
+        counts = {notif_type: len(items) for notif_type, items in by_type.items()}
+        get_page = lambda notif_type, offset: by_type[notif_type][offset:offset + NOTIFICATIONS_PAGE_SIZE]
     else:
         st.warning("⚠️ لا توجد بيانات متاحة للتحليل")
-
+        return
+    
+    display_retirement_horizon(use_database)
+    
+    if not counts:
+        st.info("🎉 لا توجد تنبيهات حالياً - جميع البيانات مكتملة")
+        return
+    
+    # تجميع حسب النوع مع العدد، وعرض صفحة واحدة من كل نوع
+    type_tabs = st.tabs([f"{notif_type} ({count})" for notif_type, count in counts.items()])
+    for tab, (notif_type, count) in zip(type_tabs, counts.items()):
+        with tab:
+            total_pages = (count - 1) // NOTIFICATIONS_PAGE_SIZE + 1
+            page = st.number_input(
+                "الصفحة",
+                min_value=1,
+                max_value=total_pages,
+                value=1,
+                key=f"notifications_page_{notif_type}"
+            )
+            st.caption(f"الصفحة {page} من {total_pages}")
+            _render_notification_cards(get_page(notif_type, (page - 1) * NOTIFICATIONS_PAGE_SIZE))
@@ -0,0 +1,198 @@
+import math
+
+#-------------------------------------
+# محرك تخطيط الهيكل التنظيمي
+#-------------------------------------
+# مستويات الهيكل التنظيمي من الأعلى إلى الأسفل
+HIERARCHY_LEVELS = ('التابعية', 'الادارة', 'موقع العمل', 'الوظيفة')
+
+ROOT_ID = 'root'
+ROOT_LABEL = 'الإدارة العليا'
+_ID_SEPARATOR = '\x1f'
+
+
+def build_hierarchy(df, levels=HIERARCHY_LEVELS, root_label=ROOT_LABEL):
+    """
+    Build the organisational tree from the hierarchy columns in one grouped pass.
+
+    Args:
+        df: DataFrame containing employee data
+        levels: Column names from the top level down; missing columns are skipped
+        root_label: Label of the synthetic root node
+
+    Returns:
+        dict: Flat node lists (ids, labels, parents, depths, counts) ready for
+        plotly treemap/icicle traces, plus a children map keyed by node id
+    """
+    levels = [col for col in levels if col in df.columns]
+
+    tree = {
+        'ids': [ROOT_ID],
+        'labels': [root_label],
+        'parents': [''],
+        'depths': [0],
+        'counts': [len(df)],
+        'children': {ROOT_ID: []},
+        'levels': levels,
+    }
+    if not levels or df.empty:
+        return tree
+
+    # تجميع واحد على أدق مستوى ثم تجميع المستويات الأعلى من نتيجته
+    keys = df[levels].fillna('غير محدد').astype(str).apply(lambda col: col.str.strip())
+    leaf_counts = keys.groupby(levels, sort=True).size()
+
+    for depth in range(1, len(levels) + 1):
+        level_counts = leaf_counts.groupby(level=list(range(depth)), sort=True).sum()
+        for path, count in level_counts.items():
+            if not isinstance(path, tuple):
+                path = (path,)
+            node_id = _ID_SEPARATOR.join((ROOT_ID,) + path)
+            parent_id = _ID_SEPARATOR.join((ROOT_ID,) + path[:-1])
+
+            tree['ids'].append(node_id)
+            tree['labels'].append(path[-1])
+            tree['parents'].append(parent_id)
+            tree['depths'].append(depth)
+            tree['counts'].append(int(count))
+            tree['children'][node_id] = []
+            tree['children'][parent_id].append(node_id)
+
+    return tree
+
+
+def visible_subtree(tree, expanded=None, max_depth=1):
+    """
+    Select the nodes that should be rendered.
+
+    Children of a node are included only while the node is above max_depth or
+    has been expanded explicitly, so collapsed branches are never laid out.
+
+    Args:
+        tree: Tree returned by build_hierarchy
+        expanded: Iterable of node ids whose children should be shown
+        max_depth: Depth that is always expanded
+
+    Returns:
+        dict: Tree with the same structure restricted to the visible nodes
+    """
+    expanded = set(expanded or [])
+    index = {node_id: i for i, node_id in enumerate(tree['ids'])}
+
+    visible = {
+        'ids': [], 'labels': [], 'parents': [], 'depths': [], 'counts': [],
+        'children': {}, 'levels': tree['levels'],
+    }
+    stack = [ROOT_ID]
+    while stack:
+        node_id = stack.pop()
+        i = index[node_id]
+        for key in ('ids', 'labels', 'parents', 'depths', 'counts'):
+            visible[key].append(tree[key][i])
+
+        children = tree['children'].get(node_id, [])
+        if children and (tree['depths'][i] < max_depth or node_id in expanded):
+            visible['children'][node_id] = list(children)
+            stack.extend(reversed(children))
+        else:
+            visible['children'][node_id] = []
+
+    return visible
+
+
+def node_path_label(node_id, separator=' / '):
+    """Return a readable path label (e.g. 'التابعية / الادارة') for a node id."""
+    return separator.join(node_id.split(_ID_SEPARATOR)[1:])
+
+
+def _leaf_order(tree):
+    """Return node ids in post-order (children before their parent)."""
+    order = []
+    stack = [(ROOT_ID, False)]
+    while stack:
+        node_id, visited = stack.pop()
+        if visited:
+            order.append(node_id)
+            continue
+        stack.append((node_id, True))
+        for child in reversed(tree['children'].get(node_id, [])):
+            stack.append((child, False))
+    return order
+
+
+def tidy_tree_layout(tree, level_gap=1.0, sibling_gap=1.0):
+    """
+    Top-down tidy tree layout in O(n).
+
+    Leaves are placed left to right in traversal order and every parent is
+    centred above its first and last child, which keeps subtrees disjoint and
+    parents symmetric over their children (the Reingold–Tilford aesthetics)
+    without the contour threading pass.
+
+    Returns:
+        dict: Mapping of node id to (x, y)
+    """
+    positions = {}
+    next_leaf_x = 0.0
+    depth_of = dict(zip(tree['ids'], tree['depths']))
+
+    for node_id in _leaf_order(tree):
+        children = tree['children'].get(node_id, [])
+        if children:
+            x = (positions[children[0]][0] + positions[children[-1]][0]) / 2
+        else:
+            x = next_leaf_x
+            next_leaf_x += sibling_gap
+        positions[node_id] = (x, -depth_of[node_id] * level_gap)
+
+    return positions
+
+
+def radial_layout(tree):
+    """
+    Radial layout in O(n): depth maps to radius and leaf order to angle.
+
+    Returns:
+        dict: Mapping of node id to (x, y)
+    """
+    tidy = tidy_tree_layout(tree)
+    leaf_count = sum(1 for node_id in tree['ids'] if not tree['children'].get(node_id))
+    span = max(leaf_count, 1)
+
+    positions = {}
+    for node_id, (x, y) in tidy.items():
+        radius = -y
+        angle = 2 * math.pi * x / span
+        positions[node_id] = (radius * math.cos(angle), radius * math.sin(angle))
+    return positions
+
+
+def compute_layout(tree, style='hierarchical'):
+    """
+    Compute node positions for the scatter-based styles.
+
+    Args:
+        tree: Tree (usually the visible subtree)
+        style: 'hierarchical' or 'radial'
+
+    Returns:
+        dict: Mapping of node id to (x, y)
+    """
+    if style == 'radial':
+        return radial_layout(tree)
+    return tidy_tree_layout(tree)
+
+
+def layout_edges(tree, positions):
+    """Return x/y coordinate lists for all parent→child edges, separated by None for plotly."""
+    edge_x, edge_y = [], []
+    for node_id, children in tree['children'].items():
+        if node_id not in positions:
+            continue
+        px_, py_ = positions[node_id]
+        for child in children:
+            cx, cy = positions[child]
+            edge_x += [px_, cx, None]
+            edge_y += [py_, cy, None]
+    return edge_x, edge_y
+
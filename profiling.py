@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+import pandas as pd
+import streamlit as st
+
+try:
+    import psutil
+except ImportError:  # memory is read from /proc/self/statm where available
+    psutil = None
+
+#-------------------------------------
+# قياس أداء الدوال الرئيسية
+#-------------------------------------
+# عدد الاستدعاءات الأخيرة المحفوظة للعرض والتصدير
+MAX_RECENT_CALLS = 500
+
+METRICS_PREFIX = 'employees_app'
+
+_lock = threading.Lock()
+_stats = {}
+_recent_calls = deque(maxlen=MAX_RECENT_CALLS)
+# استدعاءات التشغيل الحالي للسكربت (كل تشغيل يجري في خيط واحد)
+_run = threading.local()
+_process = psutil.Process() if psutil is not None else None
+
+
+def _rss_bytes():
+    """Resident memory of the process in bytes, or None when it cannot be read."""
+    if _process is not None:
+        return _process.memory_info().rss
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _default_rows(result, args, kwargs):
+    """Rows of the first DataFrame argument, else of the returned DataFrame."""
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, pd.DataFrame):
+            return len(value)
+    if isinstance(result, tuple) and result and isinstance(result[0], pd.DataFrame):
+        result = result[0]
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    return None
+
+
+def _record(name, seconds, rows, memory_delta, failed, nested=False):
+    call = {
+        'function': name,
+        'started_at': time.time() - seconds,
+        'seconds': seconds,
+        'rows': rows,
+        'memory_delta_bytes': memory_delta,
+        'failed': failed,
+        'nested': nested,
+    }
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {
+                'calls': 0, 'errors': 0, 'seconds_total': 0.0, 'seconds_max': 0.0,
+                'rows_total': 0, 'memory_delta_bytes_total': 0,
+            }
+        stats['calls'] += 1
+        stats['errors'] += failed
+        stats['seconds_total'] += seconds
+        stats['seconds_max'] = max(stats['seconds_max'], seconds)
+        stats['rows_total'] += rows or 0
+        stats['memory_delta_bytes_total'] += memory_delta or 0
+        _recent_calls.append(call)
+
+    calls = getattr(_run, 'calls', None)
+    if calls is not None:
+        calls.append(call)
+
+
+def instrument(name=None, rows=None):
+    """
+    Record wall time, rows processed and memory delta of every call of a function.
+
+    The memory delta is the change in resident memory of the whole process
+    over the call, so calls running at the same time in other sessions are
+    included in it.
+
+    Args:
+        name: Name shown in the panel; defaults to module.function
+        rows: Optional callable(result, args, kwargs) returning the number of
+            rows processed; defaults to the length of the first DataFrame
+            argument, or of the returned DataFrame for loaders
+    """
+    def decorator(func):
+        label = name or f"{func.__module__}.{func.__name__}"
+        count_rows = rows or _default_rows
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # عمق التداخل بين الدوال المقاسة حتى لا يُحسب زمن الاستدعاء الداخلي مرتين في المجموع
+            depth = getattr(_run, 'depth', 0)
+            _run.depth = depth + 1
+            memory_before = _rss_bytes()
+            started = time.perf_counter()
+            failed = True
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                seconds = time.perf_counter() - started
+                _run.depth = depth
+                memory_after = _rss_bytes()
+                memory_delta = None if memory_before is None or memory_after is None else memory_after - memory_before
+                try:
+                    processed = None if failed else count_rows(result, args, kwargs)
+                except Exception:
+                    processed = None
+                _record(label, seconds, processed, memory_delta, failed, nested=depth > 0)
+        return wrapper
+    return decorator
+
+
+def begin_rerun():
+    """
+    Start recording the calls of a script run of the current session.
+
+    The calls of the previous run are kept in st.session_state.profile_last_run
+    so the panel, which is part of the current run, can show them.
+    """
+    previous = st.session_state.get('profile_current_run')
+    if previous is not None:
+        st.session_state.profile_last_run = previous
+    _run.calls = []
+    st.session_state.profile_current_run = {'started_at': time.time(), 'calls': _run.calls}
+
+
+#-------------------------------------
+# تصدير المقاييس
+#-------------------------------------
+def get_profile_stats():
+    """
+    Aggregated measurements of every instrumented function.
+
+    Returns:
+        DataFrame: One row per function with calls, errors, total, mean and
+        max seconds, total rows and total memory delta, slowest first
+    """
+    with _lock:
+        rows = [{'function': name, **stats} for name, stats in _stats.items()]
+    if not rows:
+        return pd.DataFrame(columns=[
+            'function', 'calls', 'errors', 'seconds_total', 'seconds_mean', 'seconds_max',
+            'rows_total', 'memory_delta_bytes_total'
+        ])
+    stats = pd.DataFrame(rows)
+    stats.insert(4, 'seconds_mean', stats['seconds_total'] / stats['calls'])
+    return stats.sort_values('seconds_total', ascending=False, ignore_index=True)
+
+
+def reset_profile_stats():
+    with _lock:
+        _stats.clear()
+        _recent_calls.clear()
+
+
+def metrics_json():
+    """Aggregates and the recent calls as a JSON document."""
+    with _lock:
+        document = {
+            'generated_at': time.time(),
+            'functions': {name: dict(stats) for name, stats in _stats.items()},
+            'recent_calls': list(_recent_calls),
+        }
+    return json.dumps(document, ensure_ascii=False, indent=2)
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def metrics_prometheus():
+    """Aggregates in the Prometheus text exposition format."""
+    metrics = (
+        ('calls_total', 'counter', 'Number of calls of an instrumented function.', 'calls'),
+        ('errors_total', 'counter', 'Number of calls that raised an exception.', 'errors'),
+        ('seconds_total', 'counter', 'Wall time spent in an instrumented function.', 'seconds_total'),
+        ('seconds_max', 'gauge', 'Slowest call of an instrumented function.', 'seconds_max'),
+        ('rows_total', 'counter', 'Rows processed by an instrumented function.', 'rows_total'),
+        ('memory_delta_bytes_total', 'gauge', 'Sum of resident memory changes over the calls.', 'memory_delta_bytes_total'),
+    )
+    with _lock:
+        snapshot = {name: dict(stats) for name, stats in _stats.items()}
+
+    lines = []
+    for suffix, metric_type, description, key in metrics:
+        metric = f"{METRICS_PREFIX}_function_{suffix}"
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for name, stats in sorted(snapshot.items()):
+            lines.append(f'{metric}{{function="{_escape_label(name)}"}} {stats[key]}')
+    return "\n".join(lines) + "\n"
+
+
+#-------------------------------------
+# لوحة الأداء (للمشرفين)
+#-------------------------------------
+def _format_calls(calls):
+    table = pd.DataFrame(calls)
+    return pd.DataFrame({
+        'الدالة': table['function'],
+        'الزمن (ث)': table['seconds'].round(4),
+        'الصفوف': table['rows'],
+        'تغير الذاكرة (ميغابايت)': (table['memory_delta_bytes'] / 2**20).round(2),
+        'فشل': table['failed'],
+    })
+
+
+def show_profiling_panel():
+    """عرض قياسات أداء الدوال الرئيسية مع التصدير"""
+    st.markdown('<h3 class="rtl">أداء التطبيق</h3>', unsafe_allow_html=True)
+
+    last_run = st.session_state.get('profile_last_run')
+    st.subheader("التشغيل السابق لهذه الجلسة")
+    if last_run and last_run['calls']:
+        calls = _format_calls(last_run['calls'])
+        top_level = sum(call['seconds'] for call in last_run['calls'] if not call.get('nested'))
+        st.caption(f"مجموع زمن الدوال المقاسة (دون الاستدعاءات المتداخلة): {top_level:.3f} ث")
+        st.dataframe(calls.sort_values('الزمن (ث)', ascending=False), hide_index=True, use_container_width=True)
+    else:
+        st.info("لا توجد استدعاءات مسجلة للتشغيل السابق")
+
+    st.subheader("الإجمالي منذ تشغيل الخادم")
+    stats = get_profile_stats()
+    display = pd.DataFrame({
+        'الدالة': stats['function'],
+        'الاستدعاءات': stats['calls'],
+        'الأخطاء': stats['errors'],
+        'الزمن الكلي (ث)': stats['seconds_total'].round(3),
+        'المتوسط (ث)': stats['seconds_mean'].round(4),
+        'الأقصى (ث)': stats['seconds_max'].round(4),
+        'الصفوف': stats['rows_total'],
+        'تغير الذاكرة (ميغابايت)': (stats['memory_delta_bytes_total'] / 2**20).round(2),
+    })
+    st.dataframe(display, hide_index=True, use_container_width=True)
+    if _rss_bytes() is None:
+        st.caption("قياس الذاكرة غير متاح على هذا النظام (ثبّت psutil لتفعيله)")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "تصدير JSON", data=metrics_json, file_name="profile_metrics.json",
+            mime="application/json", key="profile_export_json"
+        )
+    with col2:
+        st.download_button(
+            "تصدير Prometheus", data=metrics_prometheus, file_name="profile_metrics.prom",
+            mime="text/plain", key="profile_export_prometheus"
+        )
+    with col3:
+        if st.button("إعادة تعيين القياسات", key="profile_reset"):
+            reset_profile_stats()
+            st.rerun()
@@ -0,0 +1,156 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+#-------------------------------------
+# حدود محاولات تسجيل الدخول (دلو الرموز)
+#-------------------------------------
+# لكل نطاق: (سعة الدلو، عدد الرموز المستعادة في الثانية)
+# رقم وظيفي واحد: 5 محاولات متتالية ثم محاولة كل دقيقة
+# عميل واحد: 20 محاولة متتالية ثم محاولة كل 15 ثانية
+LOGIN_LIMITS = {
+    'employee': (5, 1 / 60),
+    'client': (20, 1 / 15),
+}
+
+# عند تجاوز هذا العدد تُحذف الدلاء الممتلئة (غير النشطة) من الذاكرة
+MAX_TRACKED_BUCKETS = 10000
+
+# مسار ملف SQLite اختياري لحفظ حالة الدلاء بين إعادة تشغيل الخادم
+RATE_LIMIT_DB = os.environ.get("LOGIN_RATE_LIMIT_DB")
+
+_lock = threading.Lock()
+_buckets = {}
+_counters = {'allowed': 0, 'rejected_employee': 0, 'rejected_client': 0, 'resets': 0}
+_db = None
+
+
+def _get_db():
+    """Open the optional persistence database (caller holds the lock)."""
+    global _db
+    if _db is None and RATE_LIMIT_DB:
+        _db = sqlite3.connect(RATE_LIMIT_DB, check_same_thread=False)
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS login_buckets ("
+            "scope TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (scope, key))"
+        )
+        _db.commit()
+    return _db
+
+
+def _load_bucket(scope, key, now):
+    """Get a bucket from memory, the persistence database or as a full new bucket (caller holds the lock)."""
+    bucket = _buckets.get((scope, key))
+    if bucket is not None:
+        return bucket
+
+    capacity, _ = LOGIN_LIMITS[scope]
+    bucket = [float(capacity), now]
+    db = _get_db()
+    if db is not None:
+        row = db.execute(
+            "SELECT tokens, updated_at FROM login_buckets WHERE scope = ? AND key = ?", (scope, key)
+        ).fetchone()
+        if row is not None:
+            bucket = [row[0], row[1]]
+
+    if len(_buckets) >= MAX_TRACKED_BUCKETS:
+        _prune(now)
+    _buckets[(scope, key)] = bucket
+    return bucket
+
+
+def _refill(scope, bucket, now):
+    capacity, rate = LOGIN_LIMITS[scope]
+    bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+    bucket[1] = now
+
+
+def _prune(now):
+    """Drop buckets that have refilled completely (caller holds the lock)."""
+    for (scope, key), bucket in list(_buckets.items()):
+        _refill(scope, bucket, now)
+        if bucket[0] >= LOGIN_LIMITS[scope][0]:
+            del _buckets[(scope, key)]
+
+
+def _save(scope, key, bucket):
+    db = _get_db()
+    if db is None:
+        return
+    try:
+        db.execute(
+            "INSERT OR REPLACE INTO login_buckets (scope, key, tokens, updated_at) VALUES (?, ?, ?, ?)",
+            (scope, key, bucket[0], bucket[1])
+        )
+        db.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Error saving login rate limit state: {str(e)}")
+
+
+def check_login_attempt(employee_id, client):
+    """
+    Take one token from the employee and client buckets of a login attempt.
+
+    Runs entirely in memory (plus the optional SQLite file), so rejected
+    attempts never reach the database or the password hashing pool. An
+    attempt is allowed only when both buckets have a token; a rejected
+    attempt consumes nothing.
+
+    Args:
+        employee_id: Employee ID entered in the login form
+        client: Identifier of the client (IP address or session)
+
+    Returns:
+        tuple: (allowed, retry_after) with retry_after in seconds
+    """
+    now = time.time()
+    keys = (('employee', str(employee_id)), ('client', str(client)))
+    with _lock:
+        buckets = []
+        for scope, key in keys:
+            bucket = _load_bucket(scope, key, now)
+            _refill(scope, bucket, now)
+            buckets.append(bucket)
+
+        for (scope, key), bucket in zip(keys, buckets):
+            if bucket[0] < 1:
+                _counters[f'rejected_{scope}'] += 1
+                _, rate = LOGIN_LIMITS[scope]
+                return False, (1 - bucket[0]) / rate
+
+        for (scope, key), bucket in zip(keys, buckets):
+            bucket[0] -= 1
+            _save(scope, key, bucket)
+        _counters['allowed'] += 1
+    return True, 0.0
+
+
+def reset_login_attempts(employee_id):
+    """Refill the employee bucket after a successful login."""
+    with _lock:
+        bucket = _buckets.get(('employee', str(employee_id)))
+        if bucket is not None:
+            bucket[0] = float(LOGIN_LIMITS['employee'][0])
+            bucket[1] = time.time()
+            _save('employee', str(employee_id), bucket)
+        _counters['resets'] += 1
+
+
+def get_rate_limit_stats():
+    """
+    Counters of the login limiter for monitoring.
+
+    Returns:
+        dict: 'allowed', 'rejected_employee', 'rejected_client', 'resets' and
+        'tracked_buckets' (buckets currently held in memory)
+    """
+    with _lock:
+        stats = dict(_counters)
+        stats['tracked_buckets'] = len(_buckets)
+    return stats
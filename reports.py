@@ -0,0 +1,187 @@
+import time
+import logging
+import pandas as pd
+import streamlit as st
+from utils import write_excel_workbook, dataset_version
+
+logger = logging.getLogger(__name__)
+
+#-------------------------------------
+# تعريف أوراق التقارير
+#-------------------------------------
+# الأبعاد التي يُجمع عليها مرة واحدة لكل التقارير
+REPORT_DIMENSIONS = ('الادارة', 'فئة الوظيفة', 'المؤهل العلمي', 'موقع العمل')
+
+COUNT_LABEL = 'العدد'
+
+# كل ورقة تُعرف بأبعاد الصفوف والأعمدة، وتُشتق من التجميع المشترك دون المرور على البيانات مجدداً
+REPORT_SHEETS = {
+    'dept_counts': {
+        'sheet_name': 'تفاصيل الإدارات',
+        'rows': ['الادارة'],
+        'columns': [],
+        'labels': ['الإدارة', 'عدد الموظفين'],
+    },
+    'category_counts': {
+        'sheet_name': 'تفاصيل الفئات',
+        'rows': ['فئة الوظيفة'],
+        'columns': [],
+    },
+    'education_by_dept': {
+        'sheet_name': 'المؤهلات حسب الإدارة',
+        'rows': ['المؤهل العلمي'],
+        'columns': ['الادارة'],
+    },
+    'category_by_dept': {
+        'sheet_name': 'الفئات حسب الإدارة',
+        'rows': ['فئة الوظيفة'],
+        'columns': ['الادارة'],
+    },
+    'location_by_dept_category': {
+        'sheet_name': 'المواقع حسب الإدارة والفئة',
+        'rows': ['موقع العمل'],
+        'columns': ['الادارة', 'فئة الوظيفة'],
+    },
+}
+
+# أوراق التقرير الإحصائي الشامل بالترتيب
+COMPREHENSIVE_REPORT = (
+    'summary', 'dept_counts', 'category_counts',
+    'education_by_dept', 'category_by_dept', 'location_by_dept_category',
+)
+
+SUMMARY_SHEET_NAME = 'المؤشرات الرئيسية'
+SUMMARY_INDICATORS = (
+    ('عدد الإدارات', 'الادارة'),
+    ('عدد الفئات الوظيفية', 'فئة الوظيفة'),
+    ('عدد مواقع العمل', 'موقع العمل'),
+)
+
+
+#-------------------------------------
+# التجميع المشترك واشتقاق الأوراق
+#-------------------------------------
+def aggregate_report_base(df, dimensions=REPORT_DIMENSIONS):
+    """
+    Count employees over all report dimensions in a single grouped pass.
+
+    Missing values are kept as their own group so that every report sheet can
+    be rolled up from this result; each sheet drops the missing keys of its
+    own dimensions only, like pd.crosstab does.
+
+    Args:
+        df: DataFrame containing employee data
+        dimensions: Columns to group by; missing columns are skipped
+
+    Returns:
+        pandas.Series: Employee counts indexed by the dimension values
+    """
+    dimensions = [col for col in dimensions if col in df.columns]
+    if not dimensions:
+        return pd.Series(dtype='int64')
+    return df.groupby(dimensions, dropna=False, observed=True, sort=False).size()
+
+
+def report_table(base, spec):
+    """
+    Derive one report sheet from the shared aggregation.
+
+    Args:
+        base: Series returned by aggregate_report_base
+        spec: Sheet definition (an entry of REPORT_SHEETS)
+
+    Returns:
+        DataFrame: Count table; the row dimensions form the index for crosstabs
+        and regular columns for simple counts
+    """
+    keys = list(spec['rows']) + list(spec['columns'])
+    counts = base.groupby(level=keys, dropna=True, sort=True).sum()
+
+    if not spec['columns']:
+        table = counts.reset_index(name=COUNT_LABEL)
+        if spec.get('labels'):
+            table.columns = spec['labels']
+        return table
+
+    return counts.unstack(spec['columns'], fill_value=0).sort_index(axis=1)
+
+
+def summary_table(base):
+    """Key indicators (total employees and distinct values per dimension) from the shared aggregation."""
+    rows = [('إجمالي عدد الموظفين', int(base.sum()))]
+    for label, column in SUMMARY_INDICATORS:
+        if column in base.index.names:
+            values = base.index.get_level_values(column)
+            rows.append((label, int(values.dropna().nunique())))
+    return pd.DataFrame(rows, columns=['المؤشر', 'القيمة'])
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_report_base(version, _df):
+    """Shared aggregation of a dataset version, computed once for all report types."""
+    return aggregate_report_base(_df)
+
+
+def get_report_table(df, report_key, version=None):
+    """
+    Get one report table of a DataFrame from the cached shared aggregation.
+
+    Args:
+        df: DataFrame containing employee data
+        report_key: 'summary' or a key of REPORT_SHEETS
+        version: Optional precomputed dataset_version(df)
+    """
+    base = get_report_base(version or dataset_version(df), df)
+    if report_key == 'summary':
+        return summary_table(base)
+    return report_table(base, REPORT_SHEETS[report_key])
+
+
+#-------------------------------------
+# كتابة المصنف متعدد الأوراق
+#-------------------------------------
+def build_report_workbook(df, report_keys=COMPREHENSIVE_REPORT, base=None):
+    """
+    Build a multi-sheet report workbook from one shared aggregation.
+
+    Sheets are derived lazily and streamed into the workbook one at a time,
+    so only the sheet being written is held in memory besides the aggregation.
+
+    Args:
+        df: DataFrame containing employee data
+        report_keys: Sheets to include, in order ('summary' or REPORT_SHEETS keys)
+        base: Optional precomputed aggregate_report_base(df)
+
+    Returns:
+        tuple: (workbook file, timings DataFrame with the aggregation,
+        derivation and writing time of each sheet in seconds)
+    """
+    timings = []
+
+    started = time.perf_counter()
+    if base is None:
+        base = aggregate_report_base(df)
+    timings.append({'الورقة': 'التجميع المشترك', 'الاشتقاق (ث)': time.perf_counter() - started, 'الكتابة (ث)': 0.0})
+
+    def sheets():
+        for key in report_keys:
+            started = time.perf_counter()
+            if key == 'summary':
+                sheet_name, table, index = SUMMARY_SHEET_NAME, summary_table(base), False
+            else:
+                spec = REPORT_SHEETS[key]
+                sheet_name, table = spec['sheet_name'], report_table(base, spec)
+                index = bool(spec['columns'])
+            timings.append({'الورقة': sheet_name, 'الاشتقاق (ث)': time.perf_counter() - started, 'الكتابة (ث)': 0.0})
+            yield sheet_name, table, index
+
+    def record_write(sheet_name, seconds):
+        timings[-1]['الكتابة (ث)'] = seconds
+
+    workbook = write_excel_workbook(sheets(), on_sheet_written=record_write)
+
+    timings = pd.DataFrame(timings)
+    logger.info("Report workbook built: " + ", ".join(
+        f"{row['الورقة']}={row['الاشتقاق (ث)'] + row['الكتابة (ث)']:.3f}s" for _, row in timings.iterrows()
+    ))
+    return workbook, timings
@@ -0,0 +1,167 @@
+import threading
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from database import get_all_employees, register_write_listener
+from jobs import schedule_daily
+from utils import dataset_version
+
+logger = logging.getLogger(__name__)
+
+RETIREMENT_AGE = 65
+RETIREMENT_ALERT_AGE = 60
+
+BIRTH_DATE_COLUMNS = ('birth_date', 'تاريخ الميلاد')
+
+# فهارس البيانات المحملة في الجلسات، حسب نسخة البيانات
+_MAX_CACHED_INDEXES = 4
+_indexes = {}
+# فهارس جدول الموظفين حسب نطاق المستخدم (None لكل الموظفين)
+_database_indexes = {}
+_lock = threading.Lock()
+
+
+#-------------------------------------
+# بناء فهرس تواريخ الميلاد المرتب
+#-------------------------------------
+def build_retirement_index(df):
+    """
+    Build a sorted birth-date index for age milestone queries.
+
+    An employee reaches age A on birth_date + A years, so a single sorted
+    array of birth dates answers "who reaches age A between two dates" for
+    any A (retirement at 65, the 60-year alert, ...) with two binary searches.
+
+    Args:
+        df: DataFrame with a birth date column ('birth_date' or 'تاريخ الميلاد')
+
+    Returns:
+        dict: 'birth_dates' (sorted datetime64[D] array), 'labels' (matching
+        row labels of df) and 'built_at'
+    """
+    birth_col = next((col for col in BIRTH_DATE_COLUMNS if col in df.columns), None)
+    if birth_col is None:
+        births = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    else:
+        births = pd.to_datetime(df[birth_col], errors='coerce')
+
+    valid = births.notna().to_numpy()
+    birth_dates = births.to_numpy()[valid].astype('datetime64[D]')
+    order = np.argsort(birth_dates, kind='stable')
+
+    return {
+        'birth_dates': birth_dates[order],
+        'labels': df.index.to_numpy()[valid][order],
+        'built_at': datetime.now(),
+    }
+
+
+def _years_before(date, years):
+    return np.datetime64((pd.Timestamp(date) - pd.DateOffset(years=years)).date(), 'D')
+
+
+def employees_reaching_age(index, age, start=None, end=None):
+    """
+    Row labels of employees who reach `age` between start and end (inclusive).
+
+    Args:
+        index: Index returned by build_retirement_index
+        age: Age in whole years
+        start: First date of the window, or None for no lower bound
+        end: Last date of the window, or None for no upper bound
+
+    Returns:
+        numpy.ndarray: Row labels ordered by birth date (oldest first)
+    """
+    birth_dates = index['birth_dates']
+    # من يبلغ العمر بعد تاريخ البداية وُلد بعد (البداية - العمر)
+    lo = 0 if start is None else np.searchsorted(birth_dates, _years_before(start, age), side='left')
+    hi = len(birth_dates) if end is None else np.searchsorted(birth_dates, _years_before(end, age), side='right')
+    return index['labels'][lo:max(lo, hi)]
+
+
+def retiring_within_months(index, months, today=None):
+    """Row labels of employees reaching the retirement age in the next `months` months."""
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    return employees_reaching_age(index, RETIREMENT_AGE, today, today + pd.DateOffset(months=months))
+
+
+def turning_age_this_quarter(index, age=RETIREMENT_ALERT_AGE, today=None):
+    """Row labels of employees who turn `age` during the current calendar quarter."""
+    quarter = pd.Timestamp(today or datetime.now()).to_period('Q')
+    return employees_reaching_age(index, age, quarter.start_time, quarter.end_time.normalize())
+
+
+def retirement_date(birth_date):
+    """تاريخ بلوغ سن التقاعد لتاريخ ميلاد واحد"""
+    return pd.Timestamp(birth_date) + pd.DateOffset(years=RETIREMENT_AGE)
+
+
+#-------------------------------------
+# الفهارس المحفوظة وتحديثها
+#-------------------------------------
+def get_retirement_index(df, version=None):
+    """
+    Get the retirement index of a DataFrame, built once per dataset version.
+
+    Args:
+        df: DataFrame containing employee data
+        version: Optional precomputed dataset_version(df)
+    """
+    version = version or dataset_version(df)
+    with _lock:
+        index = _indexes.get(version)
+    if index is not None and index['built_at'].date() == datetime.now().date():
+        return index
+
+    index = build_retirement_index(df)
+    with _lock:
+        _indexes.pop(version, None)
+        while len(_indexes) >= _MAX_CACHED_INDEXES:
+            _indexes.pop(next(iter(_indexes)))
+        _indexes[version] = index
+    return index
+
+
+def refresh_database_retirement_index(scope=None):
+    """
+    Rebuild the index of the employees table (nightly job and after writes).
+
+    Args:
+        scope: Optional (column, value) row scope; each scope has its own index
+    """
+    df = get_all_employees(scope=scope)
+    index = build_retirement_index(df)
+    # get_all_employees returns a RangeIndex, so labels are positions into employee_ids
+    index['employee_ids'] = df['employee_id'].to_numpy() if not df.empty else np.array([])
+    with _lock:
+        _database_indexes[scope] = index
+    logger.info(f"Retirement index rebuilt for {len(index['labels'])} employees (scope: {scope}).")
+    return index
+
+
+def _invalidate_database_index():
+    with _lock:
+        _database_indexes.clear()
+
+
+def get_database_retirement_index(scope=None):
+    """
+    Get the retirement index of the employees table.
+
+    The unscoped index is rebuilt by a nightly job; every index is rebuilt
+    lazily after any employee write and on its first use of the day.
+
+    Args:
+        scope: Optional (column, value) row scope of the current user
+    """
+    schedule_daily('retirement_index', refresh_database_retirement_index, hour=2)
+    with _lock:
+        index = _database_indexes.get(scope)
+    if index is None or index['built_at'].date() != datetime.now().date():
+        index = refresh_database_retirement_index(scope)
+    return index
+
+
+register_write_listener(_invalidate_database_index)
@@ -1,10 +1,70 @@
 import pandas as pd
 import numpy as np
 import io
+import os
+import json
+import logging
 from datetime import datetime
 import re
+import hashlib
+import time
 import streamlit as st
-from openpyxl.styles import Font, PatternFill, Alignment
+import tempfile
+import gzip
+import itertools
+from profiling import instrument
+from importlib.util import find_spec
+
+logger = logging.getLogger(__name__)
+
+# xlsxwriter and openpyxl are only imported when a workbook is written;
+# without xlsxwriter, openpyxl write-only mode is used instead
+XLSXWRITER_AVAILABLE = find_spec('xlsxwriter') is not None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet and Arrow formats are unavailable
+    pa = None
+    pq = None
+
+def _prepare_employee_frame(df):
+    """
+    Normalise the types of a freshly loaded employee DataFrame in place.
+    
+    Args:
+        df: DataFrame read from Excel or a columnar file
+    
+    Returns:
+        DataFrame: The same DataFrame with dates parsed, IDs as strings and the
+        display columns mapping stored in df.attrs
+    """
+    # Convert date column to datetime if it exists
+    if 'تاريخ الميلاد' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['تاريخ الميلاد']):
+        try:
+            df['تاريخ الميلاد'] = pd.to_datetime(df['تاريخ الميلاد'], errors='coerce')
+        except:
+            # If conversion fails, keep as is
+            pass
+    
+    # Convert IDs to string type for consistent handling
+    if 'الرقم الوظيفي' in df.columns:
+        df['الرقم الوظيفي'] = df['الرقم الوظيفي'].astype(str)
+    
+    if ' الرقم الوطني' in df.columns:
+        df[' الرقم الوطني'] = df[' الرقم الوطني'].astype(str)
+    
+    # Create a mapping between original column names and simplified versions for display
+    columns_mapping = {}
+    for col in df.columns:
+        # Create a simplified name without extra spaces
+        simple_name = col.strip()
+        columns_mapping[col] = simple_name
+    
+    # Save the mapping in the dataframe as an attribute (will be used later)
+    df.attrs['columns_mapping'] = columns_mapping
+    
+    return df
 
 def load_excel_file(file):
     """
@@ -22,54 +82,483 @@ def load_excel_file(file):
         
         # Get the expected column names directly from the Excel file
         # and use them as is without renaming
-        
-        # Convert date column to datetime if it exists
-        if 'تاريخ الميلاد' in df.columns:
-            try:
-                df['تاريخ الميلاد'] = pd.to_datetime(df['تاريخ الميلاد'], errors='coerce')
-            except:
-                # If conversion fails, keep as is
-                pass
-        
-        # Convert IDs to string type for consistent handling
-        if 'الرقم الوظيفي' in df.columns:
-            df['الرقم الوظيفي'] = df['الرقم الوظيفي'].astype(str)
-        
-        if ' الرقم الوطني' in df.columns:
-            df[' الرقم الوطني'] = df[' الرقم الوطني'].astype(str)
-        
-        # Create a mapping between original column names and simplified versions for display
-        columns_mapping = {}
-        for col in df.columns:
-            # Create a simplified name without extra spaces
-            simple_name = col.strip()
-            columns_mapping[col] = simple_name
-        
-        # Save the mapping in the dataframe as an attribute (will be used later)
-        df.attrs['columns_mapping'] = columns_mapping
-        
-        return df
+        return _prepare_employee_frame(df)
     
     except Exception as e:
         st.error(f"خطأ في تحميل الملف: {str(e)}")
         return None
 
-def save_excel_file(df):
+#-------------------------------------
+# الصيغ العمودية: Parquet و Arrow IPC (Feather)
+#-------------------------------------
+PARQUET_EXTENSIONS = ('.parquet',)
+ARROW_EXTENSIONS = ('.feather', '.arrow')
+# الأعمدة النصية التي لا تتجاوز نسبة قيمها المميزة هذا الحد تُخزن كفئات (ترميز قاموسي)
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def _dictionary_encode(df):
+    """Return a copy with low-cardinality text columns converted to categoricals."""
+    encoded = df.copy()
+    for col in encoded.columns:
+        series = encoded[col]
+        if (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)) and len(series):
+            if series.nunique(dropna=True) / len(series) <= CATEGORY_MAX_UNIQUE_RATIO:
+                encoded[col] = series.astype('category')
+    # أسماء الأعمدة يجب أن تكون نصوصاً في الصيغ العمودية
+    encoded.columns = [_flatten_column_name(col) for col in encoded.columns]
+    return encoded
+
+
+def _decode_categoricals(df):
+    """Turn categoricals back into plain columns, as the rest of the app expects."""
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
+
+
+def save_parquet_file(df, index=False):
     """
-    Save DataFrame to Excel file and create a download link
+    Save DataFrame to Parquet with dictionary-encoded categoricals
     
     Args:
         df: DataFrame to save
+        index: Whether to keep the index
     
     Returns:
-        bytes: Excel file as bytes
+        bytes: Parquet file as bytes
     """
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Employee Data')
+    _dictionary_encode(df.reset_index() if index else df).to_parquet(
+        output, engine='pyarrow', index=False, compression='zstd'
+    )
+    return output.getvalue()
+
+
+def save_feather_file(df, index=False):
+    """
+    Save DataFrame to an uncompressed Arrow IPC (Feather v2) file
+    
+    Uncompressed files can be memory-mapped and read without copying.
+    
+    Args:
+        df: DataFrame to save
+        index: Whether to keep the index
     
+    Returns:
+        bytes: Arrow IPC file as bytes
+    """
+    output = io.BytesIO()
+    _dictionary_encode(df.reset_index() if index else df).to_feather(output, compression='uncompressed')
     return output.getvalue()
 
+
+def read_columnar_file(source, file_format=None):
+    """
+    Read a Parquet or Arrow IPC file without employee-specific processing
+    
+    Paths to Arrow IPC files are memory-mapped; in-memory uploads are wrapped
+    in a pyarrow buffer so the data is not copied again before conversion.
+    
+    Args:
+        source: File path or file-like object (e.g. a Streamlit upload)
+        file_format: 'parquet' or 'feather'; inferred from the name when None
+    
+    Returns:
+        DataFrame: Loaded data
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet and Arrow files")
+    
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    if file_format is None:
+        file_format = 'parquet' if str(name).lower().endswith(PARQUET_EXTENSIONS) else 'feather'
+    
+    if isinstance(source, str):
+        if file_format == 'parquet':
+            table = pq.read_table(source, memory_map=True)
+        else:
+            with pa.memory_map(source, 'r') as mapped:
+                table = pa.ipc.open_file(mapped).read_all()
+    else:
+        buffer = pa.py_buffer(source.getvalue() if hasattr(source, 'getvalue') else source.read())
+        if file_format == 'parquet':
+            table = pq.read_table(pa.BufferReader(buffer))
+        else:
+            table = pa.ipc.open_file(pa.BufferReader(buffer)).read_all()
+    
+    return table.to_pandas()
+
+
+def load_columnar_file(source, file_format=None):
+    """
+    Load and process a Parquet or Arrow IPC file containing employee data.
+    
+    Args:
+        source: File path or uploaded file
+        file_format: 'parquet' or 'feather'; inferred from the name when None
+    
+    Returns:
+        DataFrame: Processed pandas DataFrame with original column names
+    """
+    try:
+        df = _decode_categoricals(read_columnar_file(source, file_format))
+        return _prepare_employee_frame(df)
+    except Exception as e:
+        st.error(f"خطأ في تحميل الملف: {str(e)}")
+        return None
+
+
+@instrument()
+def load_data_file(file):
+    """
+    Load an employee data file, choosing the reader from its extension.
+    
+    Args:
+        file: File path or uploaded file (.xlsx, .xls, .parquet, .feather, .arrow)
+    
+    Returns:
+        DataFrame: Processed pandas DataFrame, or None on failure
+    """
+    name = str(file if isinstance(file, str) else getattr(file, 'name', '')).lower()
+    if name.endswith(PARQUET_EXTENSIONS + ARROW_EXTENSIONS):
+        return load_columnar_file(file)
+    return load_excel_file(file)
+
+#-------------------------------------
+# نسخة عمودية محلية من ملف الإكسل الافتراضي
+#-------------------------------------
+SNAPSHOT_DIR = '.snapshots'
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _snapshot_paths(source_path, snapshot_dir):
+    base = os.path.join(snapshot_dir, os.path.basename(source_path))
+    return base + '.feather', base + '.meta.json'
+
+
+@instrument()
+def load_excel_snapshot(source_path, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Load an Excel file through a local Arrow snapshot
+    
+    The first load parses the workbook once and writes a typed, uncompressed
+    Arrow IPC snapshot next to a small metadata file. Later loads memory-map
+    the snapshot as long as the source file's mtime and size are unchanged;
+    when they change, the SHA-256 of the source decides whether the snapshot
+    is rebuilt. Falls back to load_excel_file when pyarrow is unavailable.
+    
+    Args:
+        source_path: Path to the Excel file
+        snapshot_dir: Directory holding the snapshots
+    
+    Returns:
+        DataFrame: Processed pandas DataFrame, or None on failure
+    """
+    if pa is None:
+        return load_excel_file(source_path)
+    
+    snapshot_path, meta_path = _snapshot_paths(source_path, snapshot_dir)
+    stat = os.stat(source_path)
+    
+    meta = None
+    if os.path.exists(snapshot_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+    
+    if meta is not None:
+        fresh = meta.get('mtime') == stat.st_mtime and meta.get('size') == stat.st_size
+        if not fresh and meta.get('sha256') == _file_sha256(source_path):
+            # الملف لُمس دون تغيير محتواه: تحديث البيانات الوصفية فقط
+            meta.update(mtime=stat.st_mtime, size=stat.st_size)
+            _write_snapshot_meta(meta_path, meta)
+            fresh = True
+        if fresh:
+            try:
+                return _prepare_employee_frame(_decode_categoricals(read_columnar_file(snapshot_path, 'feather')))
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable snapshot {snapshot_path}: {str(e)}")
+    
+    df = load_excel_file(source_path)
+    if df is None:
+        return None
+    
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        _write_atomic(snapshot_path, save_feather_file(df))
+        _write_snapshot_meta(meta_path, {
+            'source': source_path,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha256': _file_sha256(source_path),
+            'created_at': datetime.now().isoformat(),
+        })
+    except Exception as e:
+        logger.warning(f"Could not write snapshot {snapshot_path}: {str(e)}")
+    
+    return df
+
+
+def _write_atomic(path, data):
+    """
+    Write bytes to path through a temporary file in the same directory.
+
+    Each writer gets its own temporary file, so sessions rebuilding the same
+    snapshot at once never interleave their writes, and readers only ever
+    see a complete file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_snapshot_meta(meta_path, meta):
+    _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+# حجم الدفعة عند كتابة الصفوف
+EXCEL_CHUNK_SIZE = 10000
+# عدد الصفوف المستخدمة لتقدير عرض الأعمدة
+WIDTH_SAMPLE_ROWS = 1000
+
+
+def _flatten_column_name(col):
+    if isinstance(col, tuple):
+        return ' - '.join(str(part) for part in col if str(part) != '')
+    return str(col)
+
+
+def _column_widths(headers, sample):
+    """Estimate column widths from the header and a sample of rows."""
+    widths = []
+    for position, header in enumerate(headers):
+        values = sample.iloc[:, position].dropna().astype(str)
+        max_length = max([len(header)] + values.str.len().tolist())
+        widths.append(min(max_length + 2, 80))
+    return widths
+
+
+def _iter_row_chunks(df, chunk_size):
+    """Yield rows as tuples of plain values, converting one chunk at a time."""
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def _iter_frames(data):
+    """Iterate over the DataFrame chunks of data (a DataFrame or an iterable of chunks)."""
+    if isinstance(data, pd.DataFrame):
+        return iter([data])
+    return iter(data)
+
+
+def _prepare_sheet(sheet_name, data, index, chunk_size):
+    """
+    Resolve the Excel-safe name, headers, column widths and rows of one sheet.
+
+    data may be a DataFrame or an iterable of DataFrame chunks with the same
+    columns; headers and widths come from the first chunk and the rows of the
+    others are produced only as the sheet is written.
+    """
+    chunks = _iter_frames(data)
+    first = next(chunks, None)
+    if first is None:
+        first = pd.DataFrame()
+    if index:
+        first = first.reset_index()
+        chunks = (chunk.reset_index() for chunk in chunks)
+
+    headers = [_flatten_column_name(col) for col in first.columns]
+    widths = _column_widths(headers, first.head(WIDTH_SAMPLE_ROWS))
+    rows = itertools.chain.from_iterable(
+        _iter_row_chunks(chunk, chunk_size) for chunk in itertools.chain([first], chunks)
+    )
+    # أسماء أوراق العمل في إكسل محدودة بـ 31 حرفاً
+    return sheet_name[:31], headers, widths, rows
+
+
+def _write_xlsxwriter(output, sheets, chunk_size, on_sheet_written):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'in_memory': False,
+        'default_date_format': 'yyyy-mm-dd',
+        'nan_inf_to_errors': True,
+        'remove_timezone': True,
+    })
+    header_format = workbook.add_format({
+        'bold': True, 'font_name': 'Calibri', 'font_size': 12,
+        'bg_color': '#E9ECF0', 'align': 'right', 'valign': 'vcenter', 'text_wrap': True,
+    })
+
+    for sheet_name, data, index in sheets:
+        started = time.perf_counter()
+        sheet_name, headers, widths, rows = _prepare_sheet(sheet_name, data, index, chunk_size)
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.right_to_left()
+
+        for position, width in enumerate(widths):
+            worksheet.set_column(position, position, width)
+        worksheet.write_row(0, 0, headers, header_format)
+
+        for row_number, row in enumerate(rows, start=1):
+            worksheet.write_row(row_number, 0, row)
+
+        if on_sheet_written is not None:
+            on_sheet_written(sheet_name, time.perf_counter() - started)
+
+    workbook.close()
+
+
+def _write_openpyxl(output, sheets, chunk_size, on_sheet_written):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    header_font = Font(bold=True, name='Calibri', size=12)
+    header_fill = PatternFill(start_color='E9ECF0', end_color='E9ECF0', fill_type='solid')
+    header_alignment = Alignment(horizontal='right', vertical='center', wrap_text=True)
+
+    for sheet_name, data, index in sheets:
+        started = time.perf_counter()
+        sheet_name, headers, widths, rows = _prepare_sheet(sheet_name, data, index, chunk_size)
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.sheet_view.rightToLeft = True
+
+        for position, width in enumerate(widths, start=1):
+            worksheet.column_dimensions[get_column_letter(position)].width = width
+
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(worksheet, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+
+        for row in rows:
+            worksheet.append(row)
+
+        if on_sheet_written is not None:
+            on_sheet_written(sheet_name, time.perf_counter() - started)
+
+    workbook.save(output)
+
+
+def write_excel_workbook(sheets, chunk_size=EXCEL_CHUNK_SIZE, on_sheet_written=None):
+    """
+    Write several DataFrames as sheets of one XLSX file in constant memory
+
+    Rows are written in chunks through xlsxwriter's constant_memory mode (or
+    openpyxl's write-only mode when xlsxwriter is not installed) into an
+    anonymous temporary file, so peak memory does not grow with row count.
+    `sheets` may be a generator: each sheet is consumed and written before the
+    next one is requested.
+
+    Args:
+        sheets: Iterable of (sheet_name, data, index) tuples, where data is a
+            DataFrame or an iterable of DataFrame chunks with the same columns
+        chunk_size: Number of rows converted per chunk
+        on_sheet_written: Optional callback(sheet_name, seconds) called after
+            each sheet has been written
+
+    Returns:
+        file: Unbuffered binary file positioned at the start; st.download_button
+        accepts it directly and it is deleted when closed
+    """
+    # st.download_button يقبل الملفات الخام (RawIOBase) وليس SpooledTemporaryFile
+    raw_file = tempfile.TemporaryFile(buffering=0)
+    output = io.BufferedRandom(raw_file)
+    if XLSXWRITER_AVAILABLE:
+        _write_xlsxwriter(output, sheets, chunk_size, on_sheet_written)
+    else:
+        _write_openpyxl(output, sheets, chunk_size, on_sheet_written)
+
+    output.flush()
+    output.detach()
+    raw_file.seek(0)
+    return raw_file
+
+
+def write_excel_stream(df, sheet_name="بيانات الموظفين", index=False, chunk_size=EXCEL_CHUNK_SIZE):
+    """
+    Write a DataFrame to a single-sheet XLSX file in constant memory
+
+    Args:
+        df: DataFrame to save, or an iterable of DataFrame chunks
+        sheet_name: اسم ورقة العمل
+        index: Whether to write the index as leading columns
+        chunk_size: Number of rows converted per chunk
+
+    Returns:
+        file: Unbuffered binary file positioned at the start (see write_excel_workbook)
+    """
+    return write_excel_workbook([(sheet_name, df, index)], chunk_size=chunk_size)
+
+
+def save_excel_file(df, sheet_name="بيانات الموظفين", index=False):
+    """
+    Save DataFrame to an Excel file with Arabic (RTL) sheet settings
+    
+    Args:
+        df: DataFrame to save
+        sheet_name: اسم ورقة العمل
+        index: Whether to write the index as leading columns
+    
+    Returns:
+        file: Binary file object with the workbook, accepted by st.download_button
+    """
+    return write_excel_stream(df, sheet_name=sheet_name, index=index)
+
+# أعمدة نطاق المستخدم بأسمائها في ملف الإكسل
+ROW_SCOPE_DISPLAY_COLUMNS = {'department': 'الادارة', 'affiliation': 'التابعية'}
+
+
+def apply_row_scope(df, scope):
+    """
+    Restrict a DataFrame to the rows of a user's scope
+    
+    Args:
+        df: DataFrame with English (database) or Arabic (Excel) column names
+        scope: (column, value) tuple such as ('department', 'إدارة الخدمات'), or None
+    
+    Returns:
+        DataFrame: The scoped rows as a new frame (df itself when unrestricted)
+    """
+    if not scope or df is None:
+        return df
+    column, value = scope
+    if column not in df.columns:
+        column = ROW_SCOPE_DISPLAY_COLUMNS.get(column)
+    if column not in df.columns:
+        return df.iloc[0:0].copy()
+    mask = df[column].astype(str).str.strip() == str(value).strip()
+    return df[mask].reset_index(drop=True)
+
+@instrument()
 def apply_filters(df, filters):
     """
     Apply enhanced filters to the DataFrame with advanced search capabilities
@@ -148,14 +637,257 @@ def apply_filters(df, filters):
     
     return filtered_df
 
-def convert_df_to_csv(df):
+def dataset_version(df):
+    """
+    Compute a short content hash identifying a dataset version
+
+    Args:
+        df: DataFrame to fingerprint
+
+    Returns:
+        str: Hex digest that changes whenever the data or columns change
+    """
+    if df is None:
+        return 'none'
+    digest = hashlib.sha1()
+    digest.update(repr((df.shape, list(df.columns))).encode('utf-8'))
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True).values
+    except TypeError:
+        # أعمدة تحتوي على قيم غير قابلة للتجزئة (قوائم مثلاً)
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True).values
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()[:16]
+
+# أبعاد الإحصائيات العامة: اسم العمود في ملف الإكسل ثم في قاعدة البيانات
+METADATA_DIMENSIONS = {
+    'department': ('الادارة', 'department'),
+    'job_category': ('فئة الوظيفة', 'job_category'),
+    'workplace': ('موقع العمل', 'workplace'),
+}
+
+@instrument()
+def dataset_metadata(df, source, source_path=None, modified_at=None):
+    """
+    Summarise a dataset once when it is loaded or filtered
+
+    The sidebar, the database statistics and the KPI cards read these counts
+    instead of scanning the data on every rerun.
+
+    Args:
+        df: DataFrame with Arabic (Excel) or English (database) column names
+        source: 'file' or 'database'
+        source_path: Path of the source file, if any
+        modified_at: Last modification time of the source, if known
+
+    Returns:
+        dict: 'rows', 'distinct' ({dimension: number of distinct non-empty
+        values, or None when the column is missing}), 'source', 'source_path'
+        and 'modified_at'
+    """
+    distinct = {}
+    for dimension, names in METADATA_DIMENSIONS.items():
+        column = next((name for name in names if name in df.columns), None)
+        distinct[dimension] = int(df[column].nunique()) if column is not None else None
+    return {
+        'rows': len(df),
+        'distinct': distinct,
+        'source': source,
+        'source_path': source_path,
+        'modified_at': modified_at,
+    }
+
+#-------------------------------------
+# تصدير CSV على دفعات
+#-------------------------------------
+# عدد الصفوف المحولة إلى نص في كل دفعة
+CSV_CHUNK_SIZE = 100000
+
+
+@instrument()
+def write_csv_stream(df, index=False, compress=False, chunk_size=CSV_CHUNK_SIZE):
+    """
+    Write a DataFrame to a UTF-8 CSV file in chunks
+
+    Each chunk is formatted by pandas straight into an incremental UTF-8
+    encoder on top of an anonymous temporary file (optionally through gzip),
+    so neither the whole CSV text nor its encoded copy is ever held in memory.
+    The BOM that Excel needs to detect Arabic text is written once.
+
+    Args:
+        df: DataFrame to save, or an iterable of DataFrame chunks with the same
+            columns (e.g. rows streamed from the database)
+        index: Whether to write the index as leading columns
+        compress: Whether to gzip the output
+        chunk_size: Number of rows formatted per chunk
+
+    Returns:
+        file: Unbuffered binary file positioned at the start; st.download_button
+        accepts it directly and it is deleted when closed
+    """
+    raw_file = tempfile.TemporaryFile(buffering=0)
+    output = io.BufferedRandom(raw_file)
+    sink = gzip.GzipFile(fileobj=output, mode='wb', compresslevel=6) if compress else output
+    text = io.TextIOWrapper(sink, encoding='utf-8', newline='', write_through=False)
+
+    text.write('\ufeff')
+    header = True
+    for frame in _iter_frames(df):
+        if index:
+            frame = frame.reset_index()
+        if header and frame.empty:
+            frame.to_csv(text, index=False)
+            header = False
+        for start in range(0, len(frame), chunk_size):
+            frame.iloc[start:start + chunk_size].to_csv(text, index=False, header=header)
+            header = False
+
+    text.flush()
+    text.detach()
+    if compress:
+        sink.close()
+    output.flush()
+    output.detach()
+    raw_file.seek(0)
+    return raw_file
+
+
+def convert_df_to_csv(df, compress=False):
     """
     Convert DataFrame to CSV
     
     Args:
         df: DataFrame to convert
+        compress: Whether to gzip the output
     
     Returns:
-        str: CSV string
+        bytes: CSV encoded as UTF-8 with BOM for Arabic support
+    """
+    with write_csv_stream(df, compress=compress) as csv_file:
+        return csv_file.read()
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'csv.gz', 'json', 'parquet', 'feather')
+
+EXPORT_MIME_TYPES = {
+    'xlsx': 'application/vnd.ms-excel',
+    'csv': 'text/csv',
+    'csv.gz': 'application/gzip',
+    'json': 'application/json',
+    'parquet': 'application/vnd.apache.parquet',
+    'feather': 'application/vnd.apache.arrow.file',
+}
+
+
+def available_export_formats():
+    """Export formats supported by the installed libraries."""
+    if pa is None:
+        return [fmt for fmt in EXPORT_FORMATS if fmt not in ('parquet', 'feather')]
+    return list(EXPORT_FORMATS)
+
+
+@instrument()
+def serialize_export(df, export_format, sheet_name="بيانات الموظفين", index=False):
+    """
+    Serialise a DataFrame to one of EXPORT_FORMATS
+
+    Args:
+        df: DataFrame to export
+        export_format: One of EXPORT_FORMATS
+        sheet_name: اسم ورقة العمل (Excel only)
+        index: Whether to include the index as leading columns
+
+    Returns:
+        bytes or file: File contents; Excel is returned as a streamed temporary file
+    """
+    if export_format == 'xlsx':
+        return save_excel_file(df, sheet_name=sheet_name, index=index)
+    if export_format in ('csv', 'csv.gz'):
+        return write_csv_stream(df, index=index, compress=export_format == 'csv.gz')
+    if export_format == 'json':
+        return df.to_json(orient='records', force_ascii=False).encode('utf-8')
+    if export_format == 'parquet':
+        return save_parquet_file(df, index=index)
+    if export_format == 'feather':
+        return save_feather_file(df, index=index)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _build_export(version, export_format, sheet_name, index, _df):
+    """Serialise a DataFrame once per (dataset version, format, options)."""
+    data = serialize_export(_df, export_format, sheet_name=sheet_name, index=index)
+    if isinstance(data, bytes):
+        return data
+    with data:
+        return data.read()
+
+
+def deferred_export(df, export_format, sheet_name="بيانات الموظفين", index=False, version=None):
+    """
+    Create a download callable that serialises the data only when clicked
+
+    Passing the returned callable as the data of st.download_button means no
+    export work happens on reruns; the file is built on the first click and
+    memoised by dataset version (which reflects any filtering), format and
+    options.
+
+    Args:
+        df: DataFrame to export
+        export_format: One of EXPORT_FORMATS
+        sheet_name: اسم ورقة العمل (Excel only)
+        index: Whether to include the index as leading columns
+        version: Optional cache key identifying the data (e.g. dataset version,
+            filter signature and page); df is hashed when omitted
+
+    Returns:
+        callable: Zero-argument function returning the file contents as bytes
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    def build():
+        return _build_export(version or dataset_version(df), export_format, sheet_name, index, df)
+
+    return build
+
+
+def streamed_export(source, export_format, sheet_name="بيانات الموظفين", index=False):
+    """
+    Create a download callable that writes the data through the chunked writers
+
+    Unlike deferred_export the result is not cached: every click streams the
+    data into a fresh temporary file, which suits large one-off exports.
+
+    Args:
+        source: DataFrame to export, or a zero-argument function returning an
+            iterable of DataFrame chunks (called on each click)
+        export_format: 'xlsx', 'csv' or 'csv.gz'
+        sheet_name: اسم ورقة العمل (Excel only)
+        index: Whether to include the index as leading columns
+
+    Returns:
+        callable: Zero-argument function returning an open binary file
+    """
+    if export_format not in ('xlsx', 'csv', 'csv.gz'):
+        raise ValueError(f"Unsupported streamed export format: {export_format}")
+
+    def build():
+        data = source() if callable(source) else source
+        return serialize_export(data, export_format, sheet_name=sheet_name, index=index)
+
+    return build
+
+
+def filter_signature(filters):
+    """
+    Compute a short signature of a set of search filters
+
+    Args:
+        filters: Dictionary of filter conditions (as returned by create_search_filters)
+
+    Returns:
+        str: Hex digest, or 'none' when no filters are applied
     """
-    return df.to_csv(index=False).encode('utf-8-sig')  # Use UTF-8 with BOM for Arabic support
+    if not filters:
+        return 'none'
+    return hashlib.sha1(repr(sorted(filters.items(), key=lambda item: str(item[0]))).encode('utf-8')).hexdigest()[:16]